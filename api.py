@@ -1,24 +1,91 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Query
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from main import extract_from_pdf, perform_rag, llm_response, llm_response_stream, llm_audit
-from rag import create_vector_store
+from starlette.concurrency import run_in_threadpool
+from main import (
+    get_model, get_extract_model, get_audit_model, get_agent, extract_from_pdf, llm_audit, aextract_from_pdf, allm_audit, aperform_rag, allm_response,
+    allm_response_stream, aretrieve_citations, aanswer_stream, extract_cache_key, audit_cache_key,
+    extract_by_retrieval, aextract_by_retrieval, extract_retrieval_cache_key, EXTRACT_MODE, EXTRACT_AUTO_PAGES,
+    aaudit_stream, audit_stream_cache_key, split_sections, prefilter_sections, audit_prefilter_cache_key,
+    llm_audit_prefiltered, allm_audit_prefiltered, AUDIT_PREFILTER, llm_audit_sections,
+)
+from uploads import ReceivedUpload, receive_multipart, MULTIPART_OVERHEAD
+from rag import create_vector_store, delete_vectors, get_embeddings, get_chroma_client, PORTFOLIO_INDEX
+from query_cache import query_cache
+from jobs import ingest_queue, precompute_pool
+from metrics import MetricsMiddleware, cache_lookup
+from governor import Priority, priority
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import catalog
+import export_store
+import portfolio
+import result_cache
+import risk_scanner
 from models import Extract, RAGData, AskRequest, Audit
 import os
+import hashlib
 import logging
 import re
+import shutil
+import uuid
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
+from datetime import date, datetime, timezone
 import json
+import asyncio
+import threading
+from contextlib import asynccontextmanager
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Startup
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Resources /ready waits for; all of them are created lazily on first use
+READINESS_RESOURCES = [get_model, get_extract_model, get_audit_model, get_agent, get_embeddings, get_chroma_client]
+warmup_state = {"thread": None, "error": None}
+
+
+def warmup():
+    """Create the model, agent, embeddings and vector store clients"""
+    try:
+        for resource in READINESS_RESOURCES:
+            resource()
+        catalog.get_latest()
+        warmup_state["error"] = None
+        logger.info("Warmup complete, service is ready")
+    except Exception as e:
+        warmup_state["error"] = str(e)
+        logger.error(f"Warmup failed: {str(e)}")
+
+
+def start_warmup():
+    """Start warmup in the background unless it is already running"""
+    thread = warmup_state["thread"]
+    if thread is None or not thread.is_alive():
+        thread = threading.Thread(target=warmup, name="warmup", daemon=True)
+        warmup_state["thread"] = thread
+        thread.start()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background: the server accepts requests (and answers
+    # /health) right away, /ready flips once everything is usable
+    if WARMUP_ON_STARTUP:
+        start_warmup()
+    yield
+    # Buffered export records would be lost otherwise
+    export_store.flush_all()
+
+
 app = FastAPI(
     title="Contract Intelligence API",
     description="API for extracting structured information from legal contracts",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -29,9 +96,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Configuration
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_FILE_SIZE = int(os.environ.get("MAX_FILE_SIZE_MB", "50")) * 1024 * 1024  # 50MB by default
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))  # documents processed at once per batch
+PRECOMPUTE_ON_INGEST = os.environ.get("PRECOMPUTE_ON_INGEST", "false").lower() in ("1", "true", "yes")
+PRECOMPUTE_AUDIT = os.environ.get("PRECOMPUTE_AUDIT", "stream")  # audit precomputed: "stream" (/audit/stream, the UI) or "full" (/audit)
 UPLOAD_DIR = Path("docs")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
@@ -44,30 +115,60 @@ def sanitize_filename(filename: str) -> str:
     filename = re.sub(r'[^a-zA-Z0-9._-]', '_', filename)
     return filename
 
-def get_filename(filename):
-    # Determine which file to process
-    if filename:
+def get_document(filename, document_id=None):
+    # Determine which document to process
+    if document_id:
+        document = catalog.get_document(document_id)
+        if document is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Document '{document_id}' not found. Please upload the file first."
+            )
+    elif filename:
         # Sanitize filename
         safe_filename = sanitize_filename(filename)
-        pdf_path = UPLOAD_DIR / safe_filename
+        document = catalog.get_by_name(safe_filename)
         
-        if not pdf_path.exists():
+        if document is None or not Path(document["path"]).exists():
             raise HTTPException(
                 status_code=404,
                 detail=f"File '{safe_filename}' not found. Please upload the file first."
             )
     else:
-        # Find the most recent PDF file
-        pdf_files = list(UPLOAD_DIR.glob("*.pdf"))
-        if not pdf_files:
+        # Use the most recently uploaded document
+        document = catalog.get_latest(ingested_only=False)
+        if document is None:
             raise HTTPException(
                 status_code=404,
                 detail="No PDF files found. Please upload a file first using /ingest endpoint."
             )
-        pdf_path = max(pdf_files, key=os.path.getctime)
-        logger.info(f"Using most recent file: {pdf_path.name}")
+        logger.info(f"Using most recent file: {document['name']}")
 
-    return pdf_path
+    return document
+
+
+def get_ingested_document(filename, document_id=None):
+    # Like get_document, but the document must be queryable and defaults to
+    # the most recently ingested one
+    if document_id or filename:
+        document = get_document(filename, document_id=document_id)
+    else:
+        document = catalog.get_latest()
+        if document is None:
+            raise HTTPException(
+                status_code=404,
+                detail="No ingested documents found. Please upload a file first using /ingest endpoint."
+            )
+    if document["status"] != "ingested":
+        raise HTTPException(
+            status_code=409,
+            detail=f"Document '{document['name']}' is not ready for querying (status: {document['status']})."
+        )
+    return document
+
+
+def get_filename(filename, document_id=None):
+    return Path(get_document(filename, document_id=document_id)["path"])
 
 
 @app.get("/")
@@ -78,8 +179,11 @@ def root():
         "version": "1.0.0",
         "endpoints": {
             "upload": "/ingest",
+            "jobs": "/jobs/{job_id}",
             "extract": "/extract?filename=<filename>",
-            "health": "/health"
+            "query": "/query?query=<question>",
+            "health": "/health",
+            "ready": "/ready"
         }
     }
 
@@ -99,86 +203,344 @@ def about():
 
 @app.get("/health")
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (liveness): never touches the model or vector store"""
     return {"status": "healthy", "service": "Contract Intelligence API"}
 
 
-@app.post("/ingest")
-async def upload_pdf(file: UploadFile = File(...)):
+@app.get("/ready")
+def readiness_check():
     """
-    Upload a PDF file for processing
-    
-    - **file**: PDF file to upload (max 10MB)
+    Readiness endpoint: 200 once the model, embeddings and vector store are
+    usable, 503 (while warming up) otherwise
+    """
+    components = {resource.name: resource.ready for resource in READINESS_RESOURCES}
+    if all(components.values()):
+        return {"status": "ready", "components": components}
+
+    # Starts warmup when it was disabled at startup, retries it after a failure
+    error = warmup_state["error"]
+    start_warmup()
+
+    return JSONResponse(
+        status_code=503,
+        content={"status": "starting", "components": components, "error": error}
+    )
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus metrics: per-stage and LLM latency histograms, token usage,
+    cache hit/miss counters and in-flight requests
+    """
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def as_dict(result) -> dict:
+    # Convert Pydantic model to dict
+    if isinstance(result, (Extract, Audit)):
+        return result.model_dump()
+    # If it's already a dict, use it directly
+    return result if isinstance(result, dict) else {"raw": str(result)}
+
+
+def resolve_extract_mode(document: dict, mode: Optional[str] = None) -> str:
+    """
+    Pick "full" (whole PDF sent to the model) or "retrieval" (fields extracted
+    from retrieved chunks) for a document; "auto" chooses retrieval for
+    ingested documents of at least `EXTRACT_AUTO_PAGES` pages.
+    """
+    mode = mode or EXTRACT_MODE
+    if mode == "auto":
+        large = (document.get("pages") or 0) >= EXTRACT_AUTO_PAGES
+        return "retrieval" if document["status"] == "ingested" and large else "full"
+    if mode not in ("full", "retrieval"):
+        raise HTTPException(status_code=400, detail=f"Unknown extraction mode '{mode}', use full, retrieval or auto.")
+    if mode == "retrieval" and document["status"] != "ingested":
+        raise HTTPException(
+            status_code=409,
+            detail=f"File '{document['name']}' has not been ingested yet (status: {document['status']})."
+        )
+    return mode
+
+
+def start_precompute(document: dict) -> list:
+    """
+    Kick off extraction and audit of a document in the background.
+
+    Returns:
+        list: The kinds this call scheduled; results already cached or being
+            computed by another request are left to it and not listed
+    """
+    pdf_path = document["path"]
+    started = []
+
+    # Runs at the priority of /extract and /audit, which join the in-flight
+    # precompute instead of starting their own: a lower class would leave them
+    # waiting behind ingestion (priority inversion)
+    def background(fn):
+        def compute():
+            with priority(Priority.BATCH):
+                return as_dict(fn(pdf_path))
+        return compute
+
+    extract_mode = resolve_extract_mode(document)
+    if extract_mode == "retrieval":
+        extract_key = extract_retrieval_cache_key(document["sha256"])
+        extract = background(lambda _: extract_by_retrieval(document["id"]))
+    else:
+        extract_key, extract = extract_cache_key(document["sha256"]), background(extract_from_pdf)
+
+    def extract_and_record():
+        data = extract()
+        catalog.record_fields(document["id"], data)
+        export_store.record_extract(document, data, extract_mode)
+        return data
+
+    if result_cache.submit(extract_key, "extract", extract_and_record, precompute_pool):
+        started.append("extract")
+    # /audit and /audit/stream store different results unless pre-filtering:
+    # precompute the one that will be asked for
+    if AUDIT_PREFILTER:
+        audit_key, audit_method = audit_prefilter_cache_key(document["sha256"]), "prefilter"
+        audit = background(lambda path: llm_audit_prefiltered(document["id"], path))
+    elif PRECOMPUTE_AUDIT == "stream":
+        audit_key, audit_method = audit_stream_cache_key(document["sha256"]), "stream"
+        audit = background(llm_audit_sections)
+    else:
+        audit_key, audit_method = audit_cache_key(document["sha256"]), "full"
+        audit = background(llm_audit)
+
+    def audit_and_record():
+        data = audit()
+        export_store.record_audit(document, data, audit_method)
+        return data
+
+    if result_cache.submit(audit_key, "audit", audit_and_record, precompute_pool):
+        started.append("audit")
+    return started
+
+
+# One ingestion per document at a time: re-uploads queued behind a running
+# ingest wait for it instead of racing it on the partition and the catalog row
+_ingest_locks: dict[str, threading.Lock] = {}
+_ingest_locks_lock = threading.Lock()
+
+
+def ingest_lock(document_id: str) -> threading.Lock:
+    with _ingest_locks_lock:
+        return _ingest_locks.setdefault(document_id, threading.Lock())
+
+
+def snapshot_upload(document: dict) -> Optional[str]:
+    """
+    Pin the uploaded file of a document for ingestion: a hard link (or copy)
+    next to it that a later re-upload, replacing docs/<name>, does not change
+    while pages are still being read from it.
+
+    Returns:
+        str: Path of the snapshot, to be deleted by the caller; None if the
+            file no longer holds the document's content (a newer upload
+            replaced it)
     """
+    snapshot = str(UPLOAD_DIR / f".ingest-{uuid.uuid4().hex}.pdf")
     try:
-        # Validate file type
-        if file.content_type != "application/pdf":
-            raise HTTPException(
-                status_code=400,
-                detail="Only PDF files are allowed. Please upload a valid PDF file."
-            )
-        
-        # Read file content
-        contents = await file.read()
-        
-        # Validate file size
-        if len(contents) > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File size exceeds maximum allowed size of {MAX_FILE_SIZE / (1024*1024):.1f}MB"
-            )
-        
-        # Validate PDF structure (basic check)
-        if not contents.startswith(b'%PDF'):
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid PDF file. File does not appear to be a valid PDF."
-            )
-        
-        # Sanitize filename
-        safe_filename = sanitize_filename(file.filename) # type: ignore
-        file_path = UPLOAD_DIR / safe_filename
-        
-        # Save file
-        try:
-            with open(file_path, "wb") as f:
-                f.write(contents)
-
-            file_path = str(file_path)
-            if os.path.exists("docs/uploaded_files.json"):
-                with open("docs/uploaded_files.json", "r") as f:
-                    data = json.load(f)
-                data["current_file"] = file_path
-                if not data.get(file_path, ""):
-                    create_vector_store(file_path)
-                    data[file_path] = file_path
-                    # data["current_file"] = file_path
-                with open("docs/uploaded_files.json", "w") as f:
-                    json.dump(data, f)
+        os.link(document["path"], snapshot)
+    except OSError:
+        shutil.copyfile(document["path"], snapshot)
+    digest = hashlib.sha256()
+    with open(snapshot, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    if digest.hexdigest() != document["sha256"]:
+        os.unlink(snapshot)
+        return None
+    return snapshot
 
-            else:
-                create_vector_store(file_path)
-                data = {str(file_path): file_path, "current_file": file_path}
-                with open("docs/uploaded_files.json", "w") as f:
-                    json.dump(data, f)
-            
-            
 
-            logger.info(f"File uploaded successfully: {safe_filename}")
+def ingest_file(document_id: str, sha256: Optional[str] = None, precompute: bool = False, progress=None):
+    """
+    Background ingestion job: embed a catalogued document. A re-upload under
+    the same name is diffed against the chunks already stored for it.
+
+    Ingestions of the same document run one after the other. A job queued
+    for content (`sha256`) that a newer upload has since replaced does
+    nothing: the newer upload's own job ingests the latest content.
+
+    With `precompute`, extraction and audit are started as soon as the
+    chunks are stored, so /extract and /audit find them cached or in flight.
+    """
+    with ingest_lock(document_id):
+        document = catalog.get_document(document_id)
+        if document is None:
+            raise ValueError(f"Unknown document: {document_id}")
+
+        snapshot = None
+        if sha256 is None or document["sha256"] == sha256:
+            snapshot = snapshot_upload(document)
+        if snapshot is None:
+            logger.info(f"Skipping ingestion of {document['path']}: superseded by a newer upload")
+            return {"document_id": document_id, "path": document["path"], "sha256": sha256, "superseded": True}
+
+        try:
+            if not document["vector_ids"]:
+                # Never ingested into its own partition: clear any legacy or partial leftovers
+                delete_vectors(document_id, document["path"])
+
+            # Re-uploads only embed the chunks that changed; embedding calls yield
+            # to interactive queries
+            with priority(Priority.BACKGROUND):
+                stored = create_vector_store(snapshot, document_id, progress=progress, source=document["path"])
+            logger.info(
+                f"Chunks for {document['path']}: {stored['added']} added, "
+                f"{stored['kept']} unchanged, {stored['removed']} removed"
+            )
+            catalog.mark_ingested(document_id, pages=stored["pages"], chunks=stored["chunks"], vector_ids=stored["ids"])
+            query_cache.invalidate(document_id)
         except Exception as e:
-            logger.error(f"Error saving file: {str(e)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error saving file: {str(e)}"
+            catalog.mark_failed(document_id, str(e))
+            raise
+        finally:
+            os.unlink(snapshot)
+
+    # Re-read the row: the extraction mode depends on the ingested page count
+    precomputing = start_precompute(catalog.get_document(document_id)) if precompute else []
+
+    logger.info(f"File ingested successfully: {document['path']}")
+    return {
+        "document_id": document_id,
+        "path": document["path"],
+        "sha256": document["sha256"],
+        "pages": stored["pages"],
+        "chunks": stored["chunks"],
+        "added": stored["added"],
+        "kept": stored["kept"],
+        "removed": stored["removed"],
+        "precompute": precomputing,
+    }
+
+
+async def save_upload(upload: ReceivedUpload):
+    """
+    Move a received PDF (see uploads.receive_multipart) into docs/ and
+    register it in the catalog.
+
+    Returns:
+        tuple: The catalog document and whether it duplicates an existing one
+            (in which case nothing was written and it needs no ingestion)
+
+    Raises:
+        HTTPException: If the upload failed validation while it was received
+    """
+    if upload.error:
+        raise HTTPException(status_code=400, detail=upload.error)
+
+    # Sanitize filename
+    safe_filename = sanitize_filename(upload.filename)
+    file_path = UPLOAD_DIR / safe_filename
+    tmp_path, size = upload.tmp_path, upload.size
+
+    # Identical content was already uploaded (possibly under another name)
+    content_hash = upload.sha256
+    existing = await asyncio.to_thread(catalog.get_by_hash, content_hash)
+    if existing is not None and Path(existing["path"]).exists():
+        os.unlink(tmp_path)
+        logger.info(f"Upload {safe_filename} duplicates {existing['name']}, skipping ingestion")
+        return existing, True
+
+    # Save file
+    try:
+        await asyncio.to_thread(os.replace, tmp_path, file_path)
+        document = await asyncio.to_thread(catalog.register_upload, safe_filename, str(file_path), content_hash, size)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        logger.error(f"Error saving file: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error saving file: {str(e)}"
+        )
+
+    logger.info(f"File uploaded successfully: {safe_filename}")
+    return document, False
+
+
+def multipart_schema(properties: dict, required: Optional[List[str]] = None) -> dict:
+    """OpenAPI request body for endpoints that parse their multipart body themselves"""
+    schema = {"type": "object", "properties": properties}
+    if required:
+        schema["required"] = required
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": schema}}}}
+
+
+def form_flag(fields: dict, name: str) -> Optional[bool]:
+    values = fields.get(name)
+    return values[-1].strip().lower() in ("1", "true", "yes", "on") if values else None
+
+
+@app.post("/ingest", status_code=202, openapi_extra=multipart_schema({
+    "file": {"type": "string", "format": "binary"},
+    "precompute": {"type": "boolean"},
+}, required=["file"]))
+async def upload_pdf(request: Request):
+    """
+    Upload a PDF file and queue it for ingestion
+    
+    - **file**: PDF file to upload (max 50MB by default, see `MAX_FILE_SIZE_MB`)
+    - **precompute**: Run extraction and audit in the background once ingested (defaults to `PRECOMPUTE_ON_INGEST`)
+
+    The body is parsed as it arrives: a `Content-Length` over the limit is refused before reading it,
+    and a file that is not a PDF or grows past the limit is rejected at that point.
+    Returns immediately with a job id; poll `/jobs/{job_id}` for progress.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_FILE_SIZE + MULTIPART_OVERHEAD:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File size exceeds maximum allowed size of {MAX_FILE_SIZE / (1024*1024):.1f}MB"
+        )
+    fields, uploads = await receive_multipart(request, UPLOAD_DIR, MAX_FILE_SIZE)
+    files = [upload for upload in uploads if upload.field == "file"]
+    for upload in uploads:
+        if len(files) != 1 or upload is not files[0]:
+            upload.discard()
+    if len(files) != 1:
+        raise HTTPException(status_code=400, detail="Upload exactly one PDF in the 'file' field.")
+    precompute = form_flag(fields, "precompute")
+
+    try:
+        document, duplicate = await save_upload(files[0])
+
+        if duplicate:
+            return JSONResponse(
+                status_code=200,
+                content={
+                    "message": "File already uploaded, reusing the existing document.",
+                    "filename": document["name"],
+                    "size": document["size"],
+                    "path": document["path"],
+                    "sha256": document["sha256"],
+                    "document_id": document["id"],
+                    "duplicate": True
+                }
             )
+
+        if precompute is None:
+            precompute = PRECOMPUTE_ON_INGEST
+        job_id = ingest_queue.submit(ingest_file, document["id"], document["sha256"], precompute=precompute)
+        logger.info(f"Queued ingestion of {document['name']} as job {job_id}")
         
         return JSONResponse(
-            status_code=201,
+            status_code=202,
             content={
-                "message": "File uploaded successfully!",
-                "filename": safe_filename,
-                "size": len(contents),
-                "path": file_path
+                "message": "File uploaded successfully! Ingestion has been queued.",
+                "filename": document["name"],
+                "size": document["size"],
+                "path": document["path"],
+                "sha256": document["sha256"],
+                "document_id": document["id"],
+                "job_id": job_id,
+                "status_url": f"/jobs/{job_id}"
             }
         )
     
@@ -192,32 +554,69 @@ async def upload_pdf(file: UploadFile = File(...)):
         )
 
 
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    """
+    Report the status of an ingestion job
+
+    - **job_id**: Id returned by `/ingest`
+    """
+    job = ingest_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return job
+
+
 @app.get("/extract", response_model=dict)
-def extract_content(filename: Optional[str] = Query(None, description="Name of the PDF file to extract from")):
+async def extract_content(
+    filename: Optional[str] = Query(None, description="Name of the PDF file to extract from"),
+    document_id: Optional[str] = Query(None, description="Id of the document to extract from"),
+    refresh: bool = Query(False, description="Ignore any cached result and call the model again"),
+    mode: Optional[str] = Query(None, description="full, retrieval or auto (defaults to EXTRACT_MODE)"),
+):
     """
     Extract structured data from a PDF file
     
     - **filename**: Optional filename. If not provided, uses the most recently uploaded file.
+    - **refresh**: Bypass the result cache.
+    - **mode**: `full` sends the whole PDF to the model; `retrieval` extracts each field from the
+      chunks retrieved for it (document must be ingested); `auto` uses retrieval for long contracts.
     """
     try:
         # Extract data from PDF
-        pdf_path = get_filename(filename)
+        document = await asyncio.to_thread(get_document, filename, document_id=document_id)
+        pdf_path = Path(document["path"])
+        mode = resolve_extract_mode(document, mode)
 
         try:
-            result = extract_from_pdf(str(pdf_path))
-            
-            # Convert Pydantic model to dict
-            if isinstance(result, Extract):
-                data = result.model_dump()
+            # Served from the cache, or from a precompute already in flight
+            if mode == "retrieval":
+                cache_key = extract_retrieval_cache_key(document["sha256"])
+
+                async def compute():
+                    data = as_dict(await aextract_by_retrieval(document["id"]))
+                    await asyncio.to_thread(export_store.record_extract, document, data, mode)
+                    return data
             else:
-                # If it's already a dict, use it directly
-                data = result if isinstance(result, dict) else {"raw": str(result)}
+                cache_key = extract_cache_key(document["sha256"])
+
+                async def compute():
+                    data = as_dict(await aextract_from_pdf(str(pdf_path)))
+                    await asyncio.to_thread(export_store.record_extract, document, data, mode)
+                    return data
+
+            data, cached = await result_cache.aget_or_compute(cache_key, "extract", compute, refresh=refresh)
+            if data != document["fields"]:
+                await asyncio.to_thread(catalog.record_fields, document["id"], data)
             
-            logger.info(f"Successfully extracted data from {pdf_path.name}")
+            logger.info(f"Successfully extracted data from {pdf_path.name} (cached: {cached})")
             
             return {
                 "status": "success",
                 "filename": pdf_path.name,
+                "document_id": document["id"],
+                "mode": mode,
+                "cached": cached,
                 "data": data
             }
         
@@ -228,6 +627,8 @@ def extract_content(filename: Optional[str] = Query(None, description="Name of t
                 detail=f"Error extracting data from PDF: {str(e)}"
             )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Unexpected error in extract_content: {str(e)}")
         raise HTTPException(
@@ -235,20 +636,217 @@ def extract_content(filename: Optional[str] = Query(None, description="Name of t
             detail=f"Internal server error: {str(e)}"
         )
     
+@app.post("/extract/batch", openapi_extra=multipart_schema({
+    "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+    "document_ids": {"type": "array", "items": {"type": "string"}},
+}))
+async def extract_batch(
+    request: Request,
+    refresh: bool = Query(False, description="Ignore any cached results and call the model again"),
+):
+    """
+    Ingest and extract many contracts at once, streaming results as NDJSON
+
+    - **files**: PDF files to upload, ingest and extract
+    - **document_ids**: Ids of already uploaded documents to extract
+
+    Emits one JSON line per item as soon as it completes. A failing item is
+    reported on its own line and does not abort the rest of the batch.
+    """
+    # Save every upload before streaming: the request body is gone once we return.
+    # Files are checked as they arrive; an invalid one is skipped and reported
+    fields, uploads = await receive_multipart(request, UPLOAD_DIR, MAX_FILE_SIZE, stop_on_error=False)
+    files = [upload for upload in uploads if upload.field == "files"]
+    for upload in uploads:
+        if upload.field != "files":
+            upload.discard()
+    document_ids = fields.get("document_ids", [])
+    if not files and not document_ids:
+        raise HTTPException(status_code=400, detail="Provide at least one file or document id.")
+
+    items = []
+    for file in files:
+        try:
+            document, duplicate = await save_upload(file)
+            items.append({"item": file.filename, "document": document, "ingest": not duplicate})
+        except HTTPException as e:
+            items.append({"item": file.filename, "error": e.detail})
+    for document_id in document_ids:
+        document = await asyncio.to_thread(catalog.get_document, document_id)
+        if document is None:
+            items.append({"item": document_id, "error": f"Document '{document_id}' not found."})
+        else:
+            items.append({"item": document_id, "document": document, "ingest": False})
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def process(item: dict) -> dict:
+        if "error" in item:
+            return {"item": item["item"], "status": "error", "error": item["error"]}
+
+        document = item["document"]
+        async with semaphore:
+            try:
+                async def compute():
+                    data = as_dict(await aextract_from_pdf(document["path"]))
+                    await asyncio.to_thread(export_store.record_extract, document, data, "full")
+                    return data
+
+                steps = [result_cache.aget_or_compute(
+                    extract_cache_key(document["sha256"]), "extract", compute, refresh=refresh
+                )]
+                if item["ingest"]:
+                    job_id = ingest_queue.submit(ingest_file, document["id"], document["sha256"])
+                    steps.append(asyncio.wrap_future(ingest_queue.future(job_id))) # type: ignore
+
+                # Ingestion and extraction are independent, run them side by side
+                (data, cached), *_ = await asyncio.gather(*steps)
+                await asyncio.to_thread(catalog.record_fields, document["id"], data)
+                return {
+                    "item": item["item"],
+                    "status": "success",
+                    "filename": document["name"],
+                    "document_id": document["id"],
+                    "cached": cached,
+                    "data": data
+                }
+            except Exception as e:
+                logger.error(f"Batch extraction failed for {item['item']}: {str(e)}")
+                return {
+                    "item": item["item"],
+                    "status": "error",
+                    "filename": document["name"],
+                    "document_id": document["id"],
+                    "error": str(e)
+                }
+
+    async def results():
+        for completed in asyncio.as_completed([process(item) for item in items]):
+            yield json.dumps(await completed) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 @app.get("/rag")
-def rag_retriveal(query: str):
+async def rag_retriveal(
+    query: str,
+    document_id: Optional[str] = Query(None, description="Id of the document to query"),
+    filename: Optional[str] = Query(None, description="Name of the PDF file to query"),
+):
+    """
+    Retrieve context for a query from a single document
+
+    - **document_id** / **filename**: Optional. If neither is provided, uses the most recently ingested document.
+    """
+    document = await asyncio.to_thread(get_ingested_document, filename, document_id=document_id)
 
-    output, citations = perform_rag(query)
+    # Repeat questions are answered from the semantic cache, skipping the agent
+    query_vector = await get_embeddings().aembed_query(query)
+    hit = query_cache.lookup(document["id"], document["sha256"], query_vector)
+    cache_lookup("rag_query", hit=hit is not None)
+    if hit is not None:
+        output, citations = hit
+        return {"output": output, "citations": citations, "document_id": document["id"], "cached": True}
+
+    output, citations = await aperform_rag(query, document["id"])
+    query_cache.store(document["id"], document["sha256"], query_vector, output, citations)
+
+    return {"output": output, "citations": citations, "document_id": document["id"], "cached": False}
+
+def parse_date(value: Optional[str], name: str) -> Optional[float]:
+    """ISO date (YYYY-MM-DD, UTC) to a timestamp"""
+    if value is None:
+        return None
+    try:
+        return datetime.combine(date.fromisoformat(value), datetime.min.time(), tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} '{value}', expected YYYY-MM-DD.")
+
+
+@app.get("/portfolio/search")
+async def portfolio_search(
+    query: str,
+    k: int = Query(3, ge=1, le=20, description="Hits returned per document"),
+    limit: int = Query(10, ge=1, le=100, description="Documents per page"),
+    offset: int = Query(0, ge=0, description="Documents to skip"),
+    name: Optional[str] = Query(None, description="File name contains"),
+    counterparty: Optional[str] = Query(None, description="One of the extracted parties contains"),
+    governing_law: Optional[str] = Query(None, description="Extracted governing law contains"),
+    ingested_after: Optional[str] = Query(None, description="Ingested on or after this date (YYYY-MM-DD)"),
+    ingested_before: Optional[str] = Query(None, description="Ingested before this date (YYYY-MM-DD)"),
+):
+    """
+    Similarity search across every ingested contract, grouped per document
+
+    - **query**: Text to search for, e.g. "uncapped liability"
+    - **k**: Best matching chunks returned for each document
+    - **limit** / **offset**: Page of documents, ranked by their best match; `next_offset` is null on the last page
+    - **name**, **counterparty**, **governing_law**, **ingested_after**, **ingested_before**: Optional filters.
+      Counterparty and governing law match the document's last extraction, so unextracted documents never match them.
+
+    No model is called: only the query is embedded. Needs `PORTFOLIO_INDEX` (off by default with int8 storage).
+    """
+    if not PORTFOLIO_INDEX:
+        raise HTTPException(
+            status_code=503,
+            detail="Portfolio search is disabled. Set PORTFOLIO_INDEX=true and run `python portfolio.py --backfill`."
+        )
+    try:
+        return await run_in_threadpool(
+            portfolio.search, query, k=k, limit=limit, offset=offset, name=name, counterparty=counterparty,
+            governing_law=governing_law, ingested_after=parse_date(ingested_after, "ingested_after"),
+            ingested_before=parse_date(ingested_before, "ingested_before"),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in portfolio search: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error searching the portfolio: {str(e)}")
+
+
+@app.get("/export/{kind}")
+def export_records(
+    kind: str,
+    format: str = Query("parquet", description="parquet or ndjson"),
+    since: Optional[str] = Query(None, description="Documents ingested on or after this date (YYYY-MM-DD)"),
+    until: Optional[str] = Query(None, description="Documents ingested on or before this date (YYYY-MM-DD)"),
+):
+    """
+    Stream every stored extraction or audit record, without calling the model
+
+    - **kind**: `extract` (one row per extraction, one column per field) or `audit` (one row per risky clause)
+    - **format**: `parquet` (a single Parquet file, sent row group by row group) or `ndjson` (one JSON object per line)
+    - **since** / **until**: Optional ingestion date range; whole date partitions are skipped
+
+    Records are appended each time a result is computed: keep the latest `recorded_at` per `document_id`
+    for current values.
+    """
+    store = export_store.STORES.get(kind)
+    if store is None:
+        raise HTTPException(status_code=404, detail=f"Unknown export '{kind}', use extract or audit.")
+    parse_date(since, "since")
+    parse_date(until, "until")
+
+    if format == "parquet":
+        return StreamingResponse(
+            export_store.stream_parquet(store, since, until),
+            media_type="application/vnd.apache.parquet",
+            headers={"Content-Disposition": f'attachment; filename="{kind}.parquet"'},
+        )
+    if format == "ndjson":
+        def rows():
+            for batch in store.iter_batches(since, until):
+                yield "".join(json.dumps(row, default=lambda value: value.isoformat()) + "\n" for row in batch.to_pylist())
+        return StreamingResponse(rows(), media_type="application/x-ndjson")
+    raise HTTPException(status_code=400, detail=f"Unknown format '{format}', use parquet or ndjson.")
 
-    return {"output": output, "citations": citations}
 
 @app.post("/ask")
-def llm_output(payload: AskRequest):
+async def llm_output(payload: AskRequest):
     """
     Generate final LLM answer using RAG context.
     """
     try:
-        output = llm_response(query=payload.query, context=payload.rag_data.model_dump())
+        output = await allm_response(query=payload.query, context=payload.rag_data.model_dump())
         return {"output": output}
     except Exception as e:
         logger.error(f"Error generating LLM output: {str(e)}")
@@ -256,14 +854,14 @@ def llm_output(payload: AskRequest):
 
 
 @app.post("/ask/stream")
-def llm_output_stream(payload: AskRequest):
+async def llm_output_stream(payload: AskRequest):
     """
     Stream LLM answer using RAG context (Server-Sent Events).
     """
 
-    def event_stream():
+    async def event_stream():
         try:
-            for token in llm_response_stream(payload.query, payload.rag_data.model_dump()):
+            async for token in allm_response_stream(payload.query, payload.rag_data.model_dump()):
                 if token:
                     yield f"data: {json.dumps({'token': token})}\n\n"
             # indicate completion
@@ -274,27 +872,84 @@ def llm_output_stream(payload: AskRequest):
 
     return StreamingResponse(event_stream(), media_type="text/event-stream")
     
+@app.get("/query")
+async def query_stream(
+    query: str,
+    document_id: Optional[str] = Query(None, description="Id of the document to query"),
+    filename: Optional[str] = Query(None, description="Name of the PDF file to query"),
+):
+    """
+    Retrieve context and stream the answer in one round trip (Server-Sent Events).
+
+    The first event carries the citations, followed by answer tokens and an end event.
+
+    - **document_id** / **filename**: Optional. If neither is provided, uses the most recently ingested document.
+    """
+    document = await asyncio.to_thread(get_ingested_document, filename, document_id=document_id)
+
+    async def event_stream():
+        try:
+            citations = await aretrieve_citations(query, document["id"])
+            yield f"data: {json.dumps({'event': 'citations', 'document_id': document['id'], 'citations': citations})}\n\n"
+            async for token in aanswer_stream(query, citations):
+                if token:
+                    yield f"data: {json.dumps({'token': token})}\n\n"
+            # indicate completion
+            yield "data: {\"event\": \"end\"}\n\n"
+        except Exception as e:
+            logger.error(f"Error generating streaming query output: {str(e)}")
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.get("/audit", response_model=dict)
-def audit_pdf(filename: Optional[str] = Query(None, description="Name of the PDF file to extract from")):
+async def audit_pdf(
+    filename: Optional[str] = Query(None, description="Name of the PDF file to extract from"),
+    document_id: Optional[str] = Query(None, description="Id of the document to audit"),
+    refresh: bool = Query(False, description="Ignore any cached result and call the model again"),
+    prefilter: Optional[bool] = Query(None, description="Only send clauses flagged by the local risk scanner to the model"),
+):
+    """
+    Audit a PDF file for risky clauses
 
+    - **filename**: Optional filename. If not provided, uses the most recently uploaded file.
+    - **refresh**: Bypass the result cache.
+    - **prefilter**: Scan the contract locally for risky wording and audit only the flagged clauses and
+      their neighbours; the scanner's hits are returned as `preliminary` findings. Defaults to `AUDIT_PREFILTER`.
+    """
 
-    pdf_path = get_filename(filename=filename)
+    document = await asyncio.to_thread(get_document, filename, document_id=document_id)
+    pdf_path = Path(document["path"])
+    if prefilter is None:
+        prefilter = AUDIT_PREFILTER
 
     try:
-        result = llm_audit(str(pdf_path))
-        
-        # Convert Pydantic model to dict
-        if isinstance(result, Audit):
-            data = result.model_dump()
+        # Served from the cache, or from a precompute already in flight
+        if prefilter:
+            cache_key = audit_prefilter_cache_key(document["sha256"])
+
+            async def compute():
+                data = await allm_audit_prefiltered(document["id"], str(pdf_path))
+                await asyncio.to_thread(export_store.record_audit, document, data, "prefilter")
+                return data
         else:
-            # If it's already a dict, use it directly
-            data = result if isinstance(result, dict) else {"raw": str(result)}
+            cache_key = audit_cache_key(document["sha256"])
+
+            async def compute():
+                data = as_dict(await allm_audit(str(pdf_path)))
+                await asyncio.to_thread(export_store.record_audit, document, data, "full")
+                return data
+
+        data, cached = await result_cache.aget_or_compute(cache_key, "audit", compute, refresh=refresh)
         
-        logger.info(f"Successfully auditted data from {pdf_path.name}")
+        logger.info(f"Successfully auditted data from {pdf_path.name} (cached: {cached})")
         
         return {
             "status": "success",
             "filename": pdf_path.name,
+            "document_id": document["id"],
+            "prefilter": prefilter,
+            "cached": cached,
             "data": data
         }
         
@@ -305,3 +960,96 @@ def audit_pdf(filename: Optional[str] = Query(None, description="Name of the PDF
             detail=f"Error auditing data from PDF: {str(e)}"
         )
 
+
+@app.get("/audit/stream")
+async def audit_stream(
+    filename: Optional[str] = Query(None, description="Name of the PDF file to audit"),
+    document_id: Optional[str] = Query(None, description="Id of the document to audit"),
+    refresh: bool = Query(False, description="Ignore any cached result and call the model again"),
+    prefilter: Optional[bool] = Query(None, description="Only send clauses flagged by the local risk scanner to the model"),
+):
+    """
+    Audit a PDF section by section, streaming risky clauses as they are found (Server-Sent Events).
+
+    Events: `sections` (how many sections are audited), one `finding` per risky clause with
+    its section and pages, `section_error` for a section that failed, then `result` with all
+    findings, duplicates across sections merged, and `end`.
+
+    - **filename** / **document_id**: Optional. If neither is provided, uses the most recently uploaded file.
+    - **refresh**: Bypass the result cache.
+    - **prefilter**: Audit only the clauses flagged by the local risk scanner (and their neighbours). The
+      scanner's hits are sent first, as `preliminary` events. Defaults to `AUDIT_PREFILTER`.
+    """
+    document = await asyncio.to_thread(get_document, filename, document_id=document_id)
+    pdf_path = document["path"]
+    if prefilter is None:
+        prefilter = AUDIT_PREFILTER
+    cache_key = audit_prefilter_cache_key(document["sha256"]) if prefilter else audit_stream_cache_key(document["sha256"])
+
+    def event(payload: dict) -> str:
+        return f"data: {json.dumps(payload)}\n\n"
+
+    async def event_stream():
+        try:
+            cached = None
+            if not refresh:
+                cached = await asyncio.to_thread(result_cache.get, cache_key)
+                pending = result_cache.inflight(cache_key) if cached is None else None
+                if pending is not None:
+                    # Being precomputed: wait for it and replay it rather than auditing twice
+                    try:
+                        cached = await asyncio.shield(asyncio.wrap_future(pending))
+                    except Exception as e:
+                        logger.warning(f"Precomputed audit of {document['name']} failed, auditing now: {str(e)}")
+            cache_lookup("result_audit_stream", hit=cached is not None)
+            if cached is not None:
+                # Replay the stored findings
+                for finding in cached.get("preliminary", []):
+                    yield event({"event": "preliminary", "finding": finding})
+                yield event({"event": "sections", "count": 0, "document_id": document["id"], "cached": True})
+                for risk in cached["risks"]:
+                    yield event({"event": "finding", "section": None, "pages": None, "risk": risk})
+                yield event({"event": "result", "data": cached})
+                yield "data: {\"event\": \"end\"}\n\n"
+                return
+
+            preliminary = None
+            if prefilter:
+                # Scanner hits go out right away, before any model call
+                hits, sections = await asyncio.to_thread(prefilter_sections, document["id"], pdf_path)
+                preliminary = risk_scanner.preliminary_findings(hits)
+                for finding in preliminary:
+                    yield event({"event": "preliminary", "finding": finding})
+            else:
+                sections = await asyncio.to_thread(split_sections, pdf_path)
+            failed = False
+            async for kind, *payload in aaudit_stream(pdf_path, sections=sections):
+                if kind == "sections":
+                    yield event({"event": "sections", "count": payload[0], "document_id": document["id"], "cached": False})
+                elif kind == "finding":
+                    index, risk = payload
+                    yield event({"event": "finding", "section": index, "pages": sections[index]["pages"],
+                                 "risk": risk.model_dump()})
+                elif kind == "section_error":
+                    failed = True
+                    index, error = payload
+                    logger.error(f"Auditing section {index} of {document['name']} failed: {error}")
+                    yield event({"event": "section_error", "section": index, "pages": sections[index]["pages"],
+                                 "error": error})
+                else:
+                    data = as_dict(payload[0])
+                    if preliminary is not None:
+                        data["preliminary"] = preliminary
+                    # Only complete audits are reused
+                    if not failed:
+                        await asyncio.to_thread(result_cache.put, cache_key, "audit_stream", data)
+                        await asyncio.to_thread(export_store.record_audit, document, data, "prefilter" if prefilter else "stream")
+                    yield event({"event": "result", "data": data})
+
+            logger.info(f"Successfully streamed audit of {document['name']} ({len(sections)} sections)")
+            yield "data: {\"event\": \"end\"}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming audit: {str(e)}")
+            yield event({"error": str(e)})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import json
+import time
 from typing import Optional
 
 # Page configuration
@@ -20,6 +21,8 @@ API_BASE_URL = st.sidebar.text_input(
 # Initialize session state
 if "uploaded_filename" not in st.session_state:
     st.session_state.uploaded_filename = None
+if "document_id" not in st.session_state:
+    st.session_state.document_id = None
 if "extracted_data" not in st.session_state:
     st.session_state.extracted_data = None
 if "audit_data" not in st.session_state:
@@ -58,14 +61,36 @@ with left:
                     response = requests.post(
                         url=f"{API_BASE_URL}/ingest",
                         files=files,
+                        data={"precompute": "true"},  # extract and audit in the background
                         timeout=120
                     )
                     
-                    if response.status_code == 201:
+                    if response.status_code == 200 and response.json().get("duplicate"):
                         result = response.json()
                         st.session_state.uploaded_filename = result.get("filename")
-                        st.success(f"✅ File uploaded successfully!")
-                        st.info(f"**File:** {result.get('filename')}\n**Size:** {result.get('size', 0) / 1024:.2f} KB")
+                        st.session_state.document_id = result.get("document_id")
+                        st.success(f"✅ File already uploaded as {result.get('filename')}!")
+                    elif response.status_code == 202:
+                        result = response.json()
+
+                        # Wait for the background ingestion job to finish
+                        job = {"status": "queued"}
+                        deadline = time.time() + 300
+                        while job.get("status") in ("queued", "running") and time.time() < deadline:
+                            time.sleep(1)
+                            job = requests.get(f"{API_BASE_URL}{result.get('status_url')}", timeout=10).json()
+
+                        if job.get("status") == "completed":
+                            st.session_state.uploaded_filename = result.get("filename")
+                            st.session_state.document_id = result.get("document_id")
+                            st.success(f"✅ File uploaded successfully!")
+                            st.info(f"**File:** {result.get('filename')}\n**Size:** {result.get('size', 0) / 1024:.2f} KB")
+                        elif job.get("status") == "failed":
+                            st.error(f"❌ Ingestion failed: {job.get('error')}")
+                        else:
+                            st.warning("⚠️ Ingestion is still running, check back in a moment.")
+                            st.session_state.uploaded_filename = result.get("filename")
+                            st.session_state.document_id = result.get("document_id")
                     else:
                         error_data = response.json() if response.headers.get("content-type") == "application/json" else {"detail": response.text}
                         st.error(f"❌ Error: {response.status_code}")
@@ -191,31 +216,35 @@ with right:
         query = st.chat_input("Type your query")
         response_box = st.container(border=True, height=200)
         if query:
-            with st.spinner("Generating Output..."):
-                params = {"query": query}
-                response = requests.get(f"{API_BASE_URL}/rag", params=params)
-                if response.status_code == 200:
-                    st.session_state.rag_data = response.json()
-                
+            params = {"query": query}
+            if st.session_state.document_id:
+                params["document_id"] = st.session_state.document_id
+            st.session_state.rag_data = None
+
+            def stream_answer(response):
+                # Citations arrive as the leading event, then answer tokens
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data: "):
+                        continue
+                    event = json.loads(line[len("data: "):])
+                    if event.get("event") == "citations":
+                        st.session_state.rag_data = {"citations": event.get("citations", [])}
+                    elif "token" in event:
+                        yield event["token"]
+                    elif "error" in event:
+                        st.error(f"Query failed: {event['error']}")
+
             with response_box:
-                if not st.session_state.rag_data:
-                    st.warning("No RAG context available. Please try again.")
-                else:
-                    payload = {"query": query, "rag_data": st.session_state.rag_data}
-                    response = requests.post(
-                        f"{API_BASE_URL}/ask",
-                        json=payload,
-                        headers={"Content-Type": "application/json"},
-                    )
-                    if response.status_code == 200:
-                        result = response.json()
-                        output = result.get("output", "")
-                        if output:
-                            st.write(output.get("content", ""))
-                    else:
-                        st.error(f"Ask endpoint failed: {response.status_code}")
-                        with st.expander("Error details"):
-                            st.write(response.text)
+                try:
+                    with requests.get(f"{API_BASE_URL}/query", params=params, stream=True, timeout=120) as response:
+                        if response.status_code == 200:
+                            st.write_stream(stream_answer(response))
+                        else:
+                            st.error(f"Query endpoint failed: {response.status_code}")
+                            with st.expander("Error details"):
+                                st.write(response.text)
+                except requests.exceptions.ConnectionError:
+                    st.error("❌ Could not connect to the FastAPI server.")
         
         with st.expander("RAG Output"):
             if query:
@@ -232,40 +261,55 @@ with right:
             else:
                 filename = None
             
-            with st.spinner("Auditting the document..."):
-                try:
-                    params = {"filename": filename} if filename else {}
-                    response = requests.get(
-                        url=f"{API_BASE_URL}/audit",
-                        params=params,
-                        timeout=120 
-                    )
-                    if response.status_code == 200:
-                        result = response.json()
-                        if result.get("status") == "success":
-                            st.session_state.audit_data = result.get("data", {})
-                            st.success("✅ Data auditted successfully!")
+            params = {"filename": filename} if filename else {}
+            if st.session_state.document_id:
+                params = {"document_id": st.session_state.document_id}
+            st.session_state.audit_data = None
+            status = st.empty()
+            findings_box = st.container()
 
-                            data = st.session_state.audit_data
-                            for i, risk in enumerate(data.get("risks", [])):
-                                with st.expander(f"Risk {i+1}"):
-                                    st.write(f"- Finding: {risk.get('finding', '')}")
-                                    st.write(f"- Severity: {risk.get('severity', '')}")
-                                    st.write(f"- Evidence: {risk.get('evidence', '')}")
-                        else:
-                            st.error("❌ Audit failed")
-                            st.json(result)
+            def show_risk(i, risk, pages=None):
+                title = f"Risk {i+1}" + (f" (pages {pages})" if pages else "")
+                with findings_box.expander(title):
+                    st.write(f"- Finding: {risk.get('finding', '')}")
+                    st.write(f"- Severity: {risk.get('severity', '')}")
+                    st.write(f"- Evidence: {risk.get('evidence', '')}")
+
+            try:
+                # Findings are shown as each section of the contract is audited
+                status.info("Auditting the document...")
+                with requests.get(f"{API_BASE_URL}/audit/stream", params=params, stream=True, timeout=300) as response:
+                    if response.status_code == 200:
+                        found = 0
+                        for line in response.iter_lines(decode_unicode=True):
+                            if not line or not line.startswith("data: "):
+                                continue
+                            event = json.loads(line[len("data: "):])
+                            if event.get("event") == "sections" and event.get("count"):
+                                status.info(f"Auditting {event['count']} sections...")
+                            elif event.get("event") == "finding":
+                                show_risk(found, event["risk"], event.get("pages"))
+                                found += 1
+                            elif event.get("event") == "section_error":
+                                st.warning(f"Pages {event.get('pages')} could not be audited: {event.get('error')}")
+                            elif event.get("event") == "result":
+                                st.session_state.audit_data = event.get("data", {})
+                            elif "error" in event:
+                                status.error(f"❌ Audit failed: {event['error']}")
+                        if st.session_state.audit_data is not None:
+                            risks = st.session_state.audit_data.get("risks", [])
+                            status.success(f"✅ Data auditted successfully! {len(risks)} distinct risks found.")
                     else:
                         error_data = response.json() if response.headers.get("content-type") == "application/json" else {"detail": response.text}
-                        st.error(f"❌ Error: {response.status_code}")
+                        status.error(f"❌ Error: {response.status_code}")
                         st.error(error_data.get("detail", "Unknown error occurred"))
-                except requests.exceptions.ConnectionError:
-                    st.error("❌ Could not connect to the FastAPI server.")
-                    st.info("💡 Make sure the server is running on " + API_BASE_URL)
-                except requests.exceptions.Timeout:
-                    st.error("❌ Request timed out. The extraction process is taking longer than expected.")
-                except Exception as e:
-                    st.error(f"❌ Unexpected error: {str(e)}")
+            except requests.exceptions.ConnectionError:
+                st.error("❌ Could not connect to the FastAPI server.")
+                st.info("💡 Make sure the server is running on " + API_BASE_URL)
+            except requests.exceptions.Timeout:
+                st.error("❌ Request timed out. The audit is taking longer than expected.")
+            except Exception as e:
+                st.error(f"❌ Unexpected error: {str(e)}")
         else:
             if not st.session_state.uploaded_filename:
                 st.info("💡 Upload a file, then click 'Audit'")
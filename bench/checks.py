@@ -0,0 +1,86 @@
+"""
+Offline regression checks on synthetic contracts, no model or API key needed:
+
+    python -m bench.checks
+
+Each check asserts a property the benchmark numbers rely on; the script
+exits non-zero if any of them fails.
+"""
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+from typing import Callable, List
+
+from bench.synthetic_pdf import generate_contract
+
+CHECK_PAGES = 40  # size of the contract the checks run on, as in the ingest scenario at --pages 40
+
+
+def check_clause_chunks(pages: int = CHECK_PAGES) -> str:
+    """Clause mode packs sibling clauses: never more chunks than fixed-size splitting"""
+    from clause_splitter import ClauseSplitter
+    from pdf_parsing import iter_pages
+    from rag import split_document
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = generate_contract(str(Path(tmp) / "contract.pdf"), pages=pages, seed=0)
+        parsed = list(iter_pages(path))
+
+    recursive = len(split_document(docs=parsed))
+    splitter = ClauseSplitter()
+    chunks = [chunk for page in parsed for chunk in splitter.feed(page)] + splitter.flush()
+    assert len(chunks) <= recursive, f"clause mode produced {len(chunks)} chunks, recursive {recursive}"
+    assert all(len(chunk.page_content) <= splitter.max_chars for chunk in chunks)
+    return f"{len(chunks)} clause chunks, {recursive} recursive chunks on {pages} pages"
+
+
+# Ordinary drafting the risk scanner must not flag, and risky wording it must
+BENIGN_CLAUSES = [
+    "All fees are exclusive of applicable taxes.",
+    "The courts of Delaware have exclusive jurisdiction over any dispute.",
+    "Fees include, without limitation, hosting and support.",
+    "Provider shall indemnify Customer against third party claims that the Deliverables infringe any patent.",
+    "No penalty applies to early repayment.",
+]
+RISKY_CLAUSES = {
+    "exclusivity": "Termination is Customer's sole and exclusive remedy for any failure of the Services.",
+    "penalties": "Provider shall pay a penalty of 5% of the monthly fees for each day of delay.",
+    "indemnification": "Customer shall indemnify Provider against any and all claims arising from its use of the Services.",
+    "unlimited_liability": "Customer's liability under this Section is without limitation.",
+}
+
+
+def check_risk_rules() -> str:
+    """The prefilter scanner ignores benign wording and still catches risky phrasing"""
+    import risk_scanner
+
+    def categories(text: str) -> set:
+        return {hit["category"] for hit in risk_scanner.scan([{"page_content": text, "metadata": {}}])}
+
+    for text in BENIGN_CLAUSES:
+        assert not categories(text), f"benign clause flagged as {sorted(categories(text))}: {text!r}"
+    for category, text in RISKY_CLAUSES.items():
+        assert category in categories(text), f"{category} not flagged: {text!r}"
+    return f"{len(BENIGN_CLAUSES)} benign clauses unflagged, {len(RISKY_CLAUSES)} risky clauses flagged"
+
+
+CHECKS: List[Callable[[], str]] = [check_clause_chunks, check_risk_rules]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline regression checks on synthetic contracts")
+    parser.parse_args(argv)
+
+    failed = 0
+    for check in CHECKS:
+        try:
+            print(f"ok    {check.__name__}: {check()}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL  {check.__name__}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+import asyncio
+import hashlib
+import random
+import re
+import time
+import uuid
+from typing import Any, AsyncIterator, Iterator, List, Literal, Optional, get_args, get_origin
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableBinding
+from pydantic import BaseModel
+
+WORDS = (
+    "the agreement party parties shall may term payment notice law clause liability "
+    "confidential information obligations services provider customer effective date "
+    "renewal termination indemnify damages breach written consent schedule invoice"
+).split()
+
+
+def _seed(messages: List[BaseMessage]) -> int:
+    text = "\x00".join(str(message.content) for message in messages)
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+def _input_tokens(messages: List[BaseMessage]) -> int:
+    # Roughly 4 characters per token, like the real tokenizers
+    return max(1, sum(len(str(message.content)) for message in messages) // 4)
+
+
+def fake_value(annotation: Any, rng: random.Random) -> Any:
+    """Deterministic placeholder value for a pydantic field annotation"""
+    origin = get_origin(annotation)
+    if origin is Literal:
+        return rng.choice(get_args(annotation))
+    if origin in (list, List):
+        (item,) = get_args(annotation) or (str,)
+        return [fake_value(item, rng) for _ in range(rng.randint(1, 3))]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return fake_instance(annotation, rng)
+    if annotation is int:
+        return rng.randint(1, 1000)
+    if annotation is float:
+        return rng.random()
+    if annotation is bool:
+        return rng.random() < 0.5
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12)))
+
+
+def fake_instance(schema: type[BaseModel], rng: random.Random) -> dict:
+    """Arguments for `schema` with every field filled with a placeholder"""
+    return {name: fake_value(field.annotation, rng) for name, field in schema.model_fields.items()}
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for the Gemini chat model.
+
+    Sleeps `latency` seconds before the first token, then emits `output_tokens`
+    words at `tokens_per_second`. Supports the three ways the app calls the
+    model: plain/streamed text, structured output (answered with placeholder
+    values for the schema) and the retrieval agent (one `retrieve_context`
+    call, then a final answer).
+    """
+
+    latency: float = 0.5
+    tokens_per_second: float = 200.0
+    output_tokens: int = 150
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def bind_tools(self, tools, *, tool_choice: Optional[str] = None, **kwargs):
+        return RunnableBinding(bound=self, kwargs={"tools": list(tools), "tool_choice": tool_choice})
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[list], tool_choice: Optional[str]) -> AIMessage:
+        rng = random.Random(_seed(messages))
+        tools = tools or []
+        usage = {"input_tokens": _input_tokens(messages)}
+
+        # Structured output: with_structured_output forces a call of the schema "tool"
+        schemas = [tool for tool in tools if isinstance(tool, type) and issubclass(tool, BaseModel)]
+        if schemas and tool_choice is not None:
+            args = fake_instance(schemas[0], rng)
+            return AIMessage(
+                content="",
+                tool_calls=[{"name": schemas[0].__name__, "args": args, "id": uuid.uuid4().hex, "type": "tool_call"}],
+                usage_metadata={**usage, "output_tokens": len(str(args)) // 4,
+                                "total_tokens": usage["input_tokens"] + len(str(args)) // 4},
+            )
+
+        # Agent: retrieve once, then answer from the tool results
+        names = [getattr(tool, "name", None) for tool in tools]
+        if "retrieve_context" in names and not any(isinstance(message, ToolMessage) for message in messages):
+            query = str(messages[-1].content)
+            return AIMessage(
+                content="",
+                tool_calls=[{"name": "retrieve_context", "args": {"query": query}, "id": uuid.uuid4().hex, "type": "tool_call"}],
+                usage_metadata={**usage, "output_tokens": 10, "total_tokens": usage["input_tokens"] + 10},
+            )
+
+        text = " ".join(rng.choice(WORDS) for _ in range(self.output_tokens))
+        return AIMessage(
+            content=text,
+            usage_metadata={**usage, "output_tokens": self.output_tokens,
+                            "total_tokens": usage["input_tokens"] + self.output_tokens},
+        )
+
+    def _duration(self, message: AIMessage) -> float:
+        return self.latency + message.usage_metadata["output_tokens"] / self.tokens_per_second
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, tools: Optional[list] = None,
+                  tool_choice: Optional[str] = None, **kwargs: Any) -> ChatResult:
+        message = self._respond(messages, tools, tool_choice)
+        time.sleep(self._duration(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, tools: Optional[list] = None,
+                         tool_choice: Optional[str] = None, **kwargs: Any) -> ChatResult:
+        message = self._respond(messages, tools, tool_choice)
+        await asyncio.sleep(self._duration(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, message: AIMessage) -> Iterator[ChatGenerationChunk]:
+        words = re.findall(r"\S+\s*", message.content) or [""]
+        for i, word in enumerate(words):
+            # Usage is reported once, on the last chunk, like the Gemini client
+            usage = message.usage_metadata if i == len(words) - 1 else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word, usage_metadata=usage))
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        time.sleep(self.latency)
+        for chunk in self._chunks(message):
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+            time.sleep(1 / self.tokens_per_second)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks(message):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+            await asyncio.sleep(1 / self.tokens_per_second)
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic stand-in for the Gemini embeddings.
+
+    Vectors are feature-hashed bags of words, so texts sharing terms are close
+    and retrieval still returns sensible chunks. Each call sleeps `latency`
+    plus `latency_per_text` for every text embedded.
+    """
+
+    def __init__(self, dimensions: int = 768, latency: float = 0.05, latency_per_text: float = 0.002):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.latency_per_text = latency_per_text
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "big") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency + self.latency_per_text * len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency + self.latency_per_text)
+        return self._vector(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency + self.latency_per_text * len(texts))
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency + self.latency_per_text)
+        return self._vector(text)
+
+
+def install(chat_model: BaseChatModel, embeddings: Embeddings):
+    """
+    Replace the Gemini model and embeddings of `main.py` and `rag.py` with
+    stand-ins. Must run before the first request creates the real clients.
+    """
+    import main
+    import rag
+    from embedding_cache import CachedEmbeddings
+    from governor import GovernedEmbeddings
+
+    main.get_model.set(chat_model)
+    rag.PERSIST_DIR.mkdir(exist_ok=True)
+    # Keep the on-disk cache and the governor in front, as in production
+    rag.get_embeddings.set(CachedEmbeddings(
+        GovernedEmbeddings(embeddings),
+        cache_path=str(rag.PERSIST_DIR / "embedding_cache.sqlite"),
+        namespace=f"fake-{getattr(embeddings, 'dimensions', '')}",
+    ))
@@ -0,0 +1,275 @@
+"""
+Offline benchmark of the Contract Intelligence API.
+
+Starts the API in-process on localhost with stand-in chat model and
+embeddings (see bench/fakes.py), ingests synthetic contracts and measures
+request latency and throughput per scenario and concurrency level:
+
+    python -m bench.run --concurrency 1,4,16 --requests 32 --json results.json
+
+Everything (uploads, catalog, caches, vector store) lives in a temporary
+directory, so runs never touch ./docs or ./chroma_langchain_db.
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import requests
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = ["ingest", "extract", "extract_retrieval", "audit", "rag", "ask_stream"]
+JOB_POLL_INTERVAL = 0.05  # seconds between /jobs polls while waiting for an ingest
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(name: str, concurrency: int, latencies: List[float], ttfts: List[float], errors: int, wall: float) -> dict:
+    result = {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+    if ttfts:
+        result["ttft_p50_ms"] = percentile(ttfts, 50) * 1000
+        result["ttft_p95_ms"] = percentile(ttfts, 95) * 1000
+    return result
+
+
+class Bench:
+    def __init__(self, base_url: str, workdir: Path, pages: int):
+        self.base_url = base_url
+        self.workdir = workdir
+        self.pages = pages
+        self.session = requests.Session()
+        self.session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=256))
+        self._seed = 0
+        self._seed_lock = threading.Lock()
+        self.documents: List[str] = []
+
+    def next_seed(self) -> int:
+        with self._seed_lock:
+            self._seed += 1
+            return self._seed
+
+    def next_pdf(self) -> Path:
+        """A fresh synthetic contract: distinct content, so uploads are never deduplicated"""
+        from bench.synthetic_pdf import generate_contract
+
+        seed = self.next_seed()
+        path = self.workdir / "corpus" / f"contract_{seed}.pdf"
+        path.parent.mkdir(exist_ok=True)
+        return Path(generate_contract(str(path), pages=self.pages, seed=seed))
+
+    def ingest(self, path: Path) -> str:
+        """Upload a PDF and wait for its ingestion job; returns the document id"""
+        with open(path, "rb") as f:
+            response = self.session.post(f"{self.base_url}/ingest", files={"file": (path.name, f, "application/pdf")})
+        response.raise_for_status()
+        body = response.json()
+        if body.get("job_id"):
+            while True:
+                job = self.session.get(f"{self.base_url}/jobs/{body['job_id']}").json()
+                if job["status"] == "failed":
+                    raise RuntimeError(job.get("error"))
+                if job["status"] == "completed":
+                    break
+                time.sleep(JOB_POLL_INTERVAL)
+        return body["document_id"]
+
+    def prepare_documents(self, count: int):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            self.documents = list(pool.map(self.ingest, [self.next_pdf() for _ in range(count)]))
+
+    def request(self, scenario: str, i: int, payload) -> Optional[float]:
+        """Run one request; returns the time to first token for streams"""
+        document_id = self.documents[i % len(self.documents)] if self.documents else None
+        if scenario == "ingest":
+            self.ingest(payload)
+        elif scenario in ("extract", "extract_retrieval", "audit"):
+            # refresh=true measures the model path rather than the result cache
+            params = {"document_id": document_id, "refresh": "true"}
+            if scenario.startswith("extract"):
+                params["mode"] = "retrieval" if scenario == "extract_retrieval" else "full"
+            response = self.session.get(f"{self.base_url}/{scenario.split('_')[0]}", params=params)
+            response.raise_for_status()
+        elif scenario == "rag":
+            response = self.session.get(f"{self.base_url}/rag",
+                                        params={"document_id": document_id, "query": f"What is the payment term? #{payload}"})
+            response.raise_for_status()
+        elif scenario == "ask_stream":
+            body = {
+                "query": f"Summarise the termination rights #{payload}",
+                "rag_data": {"output": "Either party may terminate for material breach.",
+                             "citations": ["CITATION 1: Either party may terminate this Agreement for material breach."]},
+            }
+            start = time.perf_counter()
+            ttft = None
+            with self.session.post(f"{self.base_url}/ask/stream", json=body, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if ttft is None and line.startswith(b"data: ") and b'"token"' in line:
+                        ttft = time.perf_counter() - start
+                    if b'"error"' in line:
+                        raise RuntimeError(line.decode())
+            return ttft
+        else:
+            raise ValueError(f"Unknown scenario: {scenario}")
+        return None
+
+    def run(self, scenario: str, concurrency: int, count: int) -> dict:
+        # Inputs are built up front so generating PDFs is not timed. Questions
+        # are numbered across the whole run so /rag never hits its semantic cache
+        payloads = [self.next_pdf() if scenario == "ingest" else self.next_seed() for _ in range(count)]
+        latencies: List[float] = []
+        ttfts: List[float] = []
+        errors = 0
+        lock = threading.Lock()
+
+        def one(i: int):
+            nonlocal errors
+            start = time.perf_counter()
+            try:
+                ttft = self.request(scenario, i, payloads[i])
+            except Exception as e:
+                print(f"  {scenario} request {i} failed: {e}", file=sys.stderr)
+                with lock:
+                    errors += 1
+                return
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                if ttft is not None:
+                    ttfts.append(ttft)
+
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(count)))
+        return summarize(scenario, concurrency, latencies, ttfts, errors, time.perf_counter() - wall_start)
+
+
+def start_server(app) -> Tuple[str, Callable[[], None]]:
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+
+    return f"http://127.0.0.1:{port}", stop
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def print_table(results: List[dict]):
+    header = f"{'scenario':<18}{'conc':>5}{'reqs':>6}{'errs':>6}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ttft p50':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        ttft = f"{r['ttft_p50_ms']:>10.1f}" if "ttft_p50_ms" in r else f"{'':>10}"
+        print(f"{r['scenario']:<18}{r['concurrency']:>5}{r['requests']:>6}{r['errors']:>6}{r['throughput_rps']:>9.2f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{ttft}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmark with stand-in LLM and embeddings")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma separated, from {SCENARIOS}")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="requests per scenario and concurrency level")
+    parser.add_argument("--pages", type=int, default=20, help="pages per synthetic contract")
+    parser.add_argument("--documents", type=int, help="pre-ingested documents queried by the non-ingest scenarios "
+                        "(default: the highest concurrency level, so concurrent requests rarely share a document)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--output-tokens", type=int, default=150)
+    parser.add_argument("--embed-dimensions", type=int, default=768)
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="seconds per embedding call")
+    parser.add_argument("--embed-latency-per-text", type=float, default=0.002, help="extra seconds per embedded text")
+    parser.add_argument("--json", help="also write the results (and the run settings) to this file")
+    args = parser.parse_args(argv)
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {sorted(unknown)}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+    json_path = Path(args.json).resolve() if args.json else None
+
+    # The API resolves docs/, the catalog and the vector store relative to the
+    # working directory: run it in a scratch one
+    workdir = Path(tempfile.mkdtemp(prefix="contract-bench-"))
+    os.chdir(workdir)
+    os.environ["WARMUP_ON_STARTUP"] = "false"
+    os.environ["PRECOMPUTE_ON_INGEST"] = "false"
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+
+    from bench.fakes import FakeChatModel, FakeEmbeddings, install
+
+    install(
+        FakeChatModel(latency=args.llm_latency, tokens_per_second=args.tokens_per_second, output_tokens=args.output_tokens),
+        FakeEmbeddings(dimensions=args.embed_dimensions, latency=args.embed_latency,
+                       latency_per_text=args.embed_latency_per_text),
+    )
+    from api import app
+
+    # Keep the report readable: per-request INFO logs would drown it
+    logging.getLogger().setLevel(logging.WARNING)
+
+    base_url, stop = start_server(app)
+    bench = Bench(base_url, workdir, pages=args.pages)
+    print(f"Benchmarking {base_url} from {workdir} (revision {git_revision()})", file=sys.stderr)
+
+    results = []
+    try:
+        if any(s != "ingest" for s in scenarios):
+            bench.prepare_documents(args.documents or max(levels))
+        for scenario in scenarios:
+            for concurrency in levels:
+                print(f"  {scenario} x{concurrency}...", file=sys.stderr)
+                results.append(bench.run(scenario, concurrency, args.requests))
+    finally:
+        stop()
+
+    print_table(results)
+    if json_path:
+        settings = {k: v for k, v in vars(args).items() if k != "json"}
+        json_path.write_text(json.dumps({"revision": git_revision(), "settings": settings, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import random
+import textwrap
+from typing import List
+
+LINES_PER_PAGE = 54
+LINE_WIDTH = 95
+
+COMPANIES = ["Acme Corporation", "Globex LLC", "Initech Inc.", "Umbrella Holdings", "Stark Industries",
+             "Wayne Enterprises", "Hooli Ltd.", "Vandelay Industries"]
+LAWS = ["the State of New York", "the State of Delaware", "England and Wales", "the State of California"]
+
+CLAUSES = {
+    "Definitions": [
+        "\"Confidential Information\" means all non-public information disclosed by either party.",
+        "\"Services\" means the services described in each Statement of Work executed under this Agreement.",
+        "\"Deliverables\" means all work product provided by the Provider in the course of the Services.",
+    ],
+    "Term and Renewal": [
+        "This Agreement commences on the Effective Date and continues for an initial term of {years} years.",
+        "Thereafter this Agreement shall automatically renew for successive one-year terms unless either party "
+        "gives written notice of non-renewal at least {days} days before the end of the then-current term.",
+    ],
+    "Payment": [
+        "Customer shall pay all undisputed invoices within {days} days of receipt.",
+        "Late payments bear interest at {rate}% per month or the maximum rate permitted by law, whichever is lower.",
+        "All fees are non-refundable and exclusive of applicable taxes.",
+    ],
+    "Confidentiality": [
+        "Each party shall hold the other party's Confidential Information in strict confidence and shall not "
+        "disclose it to any third party without prior written consent.",
+        "These obligations survive termination of this Agreement for a period of {years} years.",
+    ],
+    "Indemnification": [
+        "Customer shall indemnify, defend and hold harmless Provider from any and all claims, losses and damages "
+        "arising out of or relating to Customer's use of the Services, without limitation.",
+        "Provider shall indemnify Customer against third party claims that the Deliverables infringe any patent.",
+    ],
+    "Limitation of Liability": [
+        "In no event shall either party be liable for any indirect, incidental or consequential damages.",
+        "Each party's aggregate liability under this Agreement shall not exceed USD {amount}.",
+    ],
+    "Termination": [
+        "Either party may terminate this Agreement for material breach not cured within {days} days of notice.",
+        "Provider may terminate this Agreement at any time, for any reason, upon written notice to Customer.",
+    ],
+    "Governing Law": [
+        "This Agreement is governed by the laws of {law}, without regard to its conflict of laws principles.",
+        "Each party irrevocably waives any right to a trial by jury.",
+    ],
+    "General": [
+        "Neither party may assign this Agreement without the prior written consent of the other party.",
+        "Provider may modify these terms at its sole discretion by posting an updated version.",
+        "This Agreement constitutes the entire agreement between the parties.",
+    ],
+}
+
+
+def contract_lines(pages: int, seed: int = 0) -> List[str]:
+    """Text of a synthetic services contract, wrapped, about `pages` pages long"""
+    rng = random.Random(seed)
+    provider, customer = rng.sample(COMPANIES, 2)
+    values = {
+        "years": rng.randint(1, 5), "days": rng.choice([15, 30, 45, 60, 90]),
+        "rate": rng.choice([1, 1.5, 2]), "amount": f"{rng.randint(1, 500) * 1000:,}", "law": rng.choice(LAWS),
+    }
+
+    lines = [
+        f"MASTER SERVICES AGREEMENT No. {seed}",
+        "",
+        f"This Master Services Agreement is entered into on January {rng.randint(1, 28)}, 2024 between "
+        f"{provider} (\"Provider\") and {customer} (\"Customer\").",
+        "",
+    ]
+    article = 0
+    while len(lines) < pages * LINES_PER_PAGE:
+        for title, sentences in CLAUSES.items():
+            article += 1
+            lines.append(f"ARTICLE {article}")
+            lines.append(title.upper())
+            for section, sentence in enumerate(sentences, start=1):
+                # Filler keeps clauses a realistic length, different per seed
+                filler = " ".join(rng.choice(sentences).format(**values) for _ in range(rng.randint(1, 4)))
+                paragraph = f"{article}.{section} {sentence.format(**values)} {filler}"
+                lines.extend(textwrap.wrap(paragraph, LINE_WIDTH))
+            lines.append("")
+
+    lines = lines[:pages * LINES_PER_PAGE - 4]
+    lines += ["", "IN WITNESS WHEREOF the parties have executed this Agreement.",
+              f"For {provider}: Jane Doe, Chief Executive Officer", f"For {customer}: John Roe, General Counsel"]
+    return lines
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, lines: List[str]):
+    """Write text lines as a plain Helvetica PDF, LINES_PER_PAGE lines per page"""
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+
+    # Object numbers: 1 catalog, 2 page tree, 3 font, then a page and its content stream per page
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    }
+    kids = []
+    for i, page_lines in enumerate(pages):
+        page_number, content_number = 4 + 2 * i, 5 + 2 * i
+        kids.append(f"{page_number} 0 R")
+        text = "\n".join(f"({_escape(line)}) '" for line in page_lines)
+        stream = f"BT /F1 10 Tf 13 TL 50 760 Td\n{text}\nET".encode("latin-1", "replace")
+        objects[page_number] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_number} 0 R >>"
+        ).encode("latin-1")
+        objects[content_number] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode("latin-1")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, objects[number])
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for number in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[number]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def generate_contract(path: str, pages: int = 20, seed: int = 0) -> str:
+    """Write a synthetic contract PDF; the same seed always gives the same file"""
+    write_pdf(path, contract_lines(pages, seed))
+    return path
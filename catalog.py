@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+CATALOG_PATH = os.environ.get("CATALOG_PATH", "docs/catalog.sqlite")
+LEGACY_REGISTRY_PATH = "docs/uploaded_files.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id          TEXT PRIMARY KEY,
+    name        TEXT NOT NULL UNIQUE,
+    path        TEXT NOT NULL,
+    sha256      TEXT NOT NULL,
+    size        INTEGER NOT NULL DEFAULT 0,
+    pages       INTEGER,
+    chunks      INTEGER,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    error       TEXT,
+    uploaded_at REAL NOT NULL,
+    ingested_at REAL,
+    vector_ids  TEXT NOT NULL DEFAULT '[]',
+    fields      TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_documents_sha256 ON documents (sha256);
+CREATE INDEX IF NOT EXISTS idx_documents_uploaded_at ON documents (uploaded_at);
+CREATE INDEX IF NOT EXISTS idx_documents_ingested_at ON documents (status, ingested_at);
+"""
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def _connect() -> sqlite3.Connection:
+    """Return this thread's catalog connection, creating the schema on first use"""
+    global _initialized
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(CATALOG_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(CATALOG_PATH, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                conn.executescript(SCHEMA)
+                _migrate(conn)
+                _import_legacy_registry(conn)
+                _initialized = True
+    return conn
+
+
+def _migrate(conn: sqlite3.Connection):
+    """Add columns introduced after a catalog was created"""
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(documents)")}
+    if "fields" not in columns:
+        with conn:
+            conn.execute("ALTER TABLE documents ADD COLUMN fields TEXT")
+
+
+def _to_dict(row: Optional[sqlite3.Row]) -> Optional[dict]:
+    if row is None:
+        return None
+    document = dict(row)
+    document["vector_ids"] = json.loads(document["vector_ids"])
+    document["fields"] = json.loads(document["fields"]) if document["fields"] else None
+    return document
+
+
+def _import_legacy_registry(conn: sqlite3.Connection):
+    """One-off import of docs/uploaded_files.json into an empty catalog"""
+    if not os.path.exists(LEGACY_REGISTRY_PATH):
+        return
+    if conn.execute("SELECT 1 FROM documents LIMIT 1").fetchone():
+        return
+
+    with open(LEGACY_REGISTRY_PATH, "r") as f:
+        data = json.load(f)
+    current_file = data.get("current_file")
+
+    with conn:
+        for path in data:
+            if path in ("current_file", "hashes") or not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                sha256 = hashlib.file_digest(f, "sha256").hexdigest()
+            stat = os.stat(path)
+            # Make sure the legacy current file comes out as the latest one
+            ingested_at = time.time() if path == current_file else stat.st_mtime
+            conn.execute(
+                "INSERT OR IGNORE INTO documents (id, name, path, sha256, size, status, uploaded_at, ingested_at) "
+                "VALUES (?, ?, ?, ?, ?, 'ingested', ?, ?)",
+                (uuid.uuid4().hex, os.path.basename(path), path, sha256, stat.st_size, stat.st_mtime, ingested_at),
+            )
+    logger.info(f"Imported legacy registry {LEGACY_REGISTRY_PATH} into {CATALOG_PATH}")
+
+
+def get_document(document_id: str) -> Optional[dict]:
+    """Look up a document by id"""
+    row = _connect().execute("SELECT * FROM documents WHERE id = ?", (document_id,)).fetchone()
+    return _to_dict(row)
+
+
+def get_by_name(name: str) -> Optional[dict]:
+    """Look up a document by its (sanitized) file name"""
+    row = _connect().execute("SELECT * FROM documents WHERE name = ?", (name,)).fetchone()
+    return _to_dict(row)
+
+
+def get_by_hash(sha256: str) -> Optional[dict]:
+    """Look up a live (pending or ingested) document with the given content hash"""
+    row = _connect().execute(
+        "SELECT * FROM documents WHERE sha256 = ? AND status != 'failed' ORDER BY uploaded_at DESC LIMIT 1",
+        (sha256,),
+    ).fetchone()
+    return _to_dict(row)
+
+
+def get_latest(ingested_only: bool = True) -> Optional[dict]:
+    """
+    Return the most recent document.
+
+    Args:
+        ingested_only: If True, the most recently ingested document; otherwise
+            the most recently uploaded one regardless of ingestion status
+    """
+    if ingested_only:
+        query = "SELECT * FROM documents WHERE status = 'ingested' ORDER BY ingested_at DESC LIMIT 1"
+    else:
+        query = "SELECT * FROM documents ORDER BY uploaded_at DESC LIMIT 1"
+    return _to_dict(_connect().execute(query).fetchone())
+
+
+def list_documents(limit: int = 100, offset: int = 0) -> List[dict]:
+    """List documents, most recently uploaded first"""
+    rows = _connect().execute(
+        "SELECT * FROM documents ORDER BY uploaded_at DESC LIMIT ? OFFSET ?", (limit, offset)
+    ).fetchall()
+    return [_to_dict(row) for row in rows]
+
+
+def get_documents(document_ids: List[str]) -> dict:
+    """Look up many documents at once, returns {id: document}"""
+    documents = {}
+    # Stay well under SQLite's bound-parameter limit
+    for start in range(0, len(document_ids), 500):
+        batch = document_ids[start:start + 500]
+        rows = _connect().execute(
+            f"SELECT * FROM documents WHERE id IN ({','.join('?' * len(batch))})", batch
+        ).fetchall()
+        documents.update((row["id"], _to_dict(row)) for row in rows)
+    return documents
+
+
+def find_documents(name: Optional[str] = None, counterparty: Optional[str] = None,
+                   governing_law: Optional[str] = None, ingested_after: Optional[float] = None,
+                   ingested_before: Optional[float] = None) -> List[str]:
+    """
+    Ids of the documents ingested into their own partition that match every
+    given filter. Text filters are case-insensitive substring matches;
+    `counterparty` and `governing_law` match the document's last extraction.
+    """
+    clauses = ["status = 'ingested'", "vector_ids != '[]'"]
+    params: list = []
+    if name:
+        clauses.append("name LIKE ?")
+        params.append(f"%{name}%")
+    if counterparty:
+        clauses.append("EXISTS (SELECT 1 FROM json_each(fields, '$.parties') WHERE value LIKE ?)")
+        params.append(f"%{counterparty}%")
+    if governing_law:
+        clauses.append("json_extract(fields, '$.governing_law') LIKE ?")
+        params.append(f"%{governing_law}%")
+    if ingested_after is not None:
+        clauses.append("ingested_at >= ?")
+        params.append(ingested_after)
+    if ingested_before is not None:
+        clauses.append("ingested_at < ?")
+        params.append(ingested_before)
+    rows = _connect().execute(f"SELECT id FROM documents WHERE {' AND '.join(clauses)}", params).fetchall()
+    return [row["id"] for row in rows]
+
+
+def register_upload(name: str, path: str, sha256: str, size: int) -> dict:
+    """
+    Record a freshly uploaded file as pending ingestion.
+
+    Re-uploading an existing name keeps its document id (and its previous
+    vector ids, so ingestion can replace them).
+    """
+    conn = _connect()
+    with conn:
+        conn.execute(
+            "INSERT INTO documents (id, name, path, sha256, size, status, uploaded_at) "
+            "VALUES (?, ?, ?, ?, ?, 'pending', ?) "
+            "ON CONFLICT(name) DO UPDATE SET path = excluded.path, sha256 = excluded.sha256, "
+            "size = excluded.size, status = 'pending', error = NULL, uploaded_at = excluded.uploaded_at",
+            (uuid.uuid4().hex, name, path, sha256, size, time.time()),
+        )
+    return get_by_name(name) # type: ignore
+
+
+def mark_ingested(document_id: str, pages: int, chunks: int, vector_ids: List[str]):
+    """Record a successful ingestion"""
+    conn = _connect()
+    with conn:
+        conn.execute(
+            "UPDATE documents SET status = 'ingested', error = NULL, pages = ?, chunks = ?, "
+            "vector_ids = ?, ingested_at = ? WHERE id = ?",
+            (pages, chunks, json.dumps(vector_ids), time.time(), document_id),
+        )
+
+
+def mark_failed(document_id: str, error: str):
+    """Record a failed ingestion"""
+    conn = _connect()
+    with conn:
+        conn.execute(
+            "UPDATE documents SET status = 'failed', error = ? WHERE id = ?", (error, document_id)
+        )
+
+
+def record_fields(document_id: str, fields: dict):
+    """Keep a document's latest extracted fields, used by portfolio search filters"""
+    conn = _connect()
+    with conn:
+        conn.execute("UPDATE documents SET fields = ? WHERE id = ?", (json.dumps(fields), document_id))
@@ -0,0 +1,138 @@
+import re
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# Configuration
+MAX_CLAUSE_CHARS = 2000  # longer clauses fall back to size-based splitting
+MIN_CLAUSE_CHARS = 80  # shorter clauses (usually bare headings) are merged into the next one
+
+# Heading patterns, matched at the start of a line
+ARTICLE_PATTERN = re.compile(r"^\s*(ARTICLE|Article)\s+([IVXLC]+|\d+)\b")
+SECTION_PATTERN = re.compile(r"^\s*(?:SECTION|Section|§)\s*(\d+(?:\.\d+)*)\b")
+NUMBERED_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)*)\.?\s+(?=[A-Z(\"“])")
+CAPS_HEADING_PATTERN = re.compile(r"^\s*([A-Z][A-Z &,/'-]{3,60})\s*:?\s*$")
+
+
+def parse_heading(line: str) -> Optional[Tuple[int, str]]:
+    """
+    Recognise a clause heading line.
+
+    Returns:
+        tuple: (level, label) of the heading, or None if the line is body text.
+            Articles are level 0, "12" level 1, "12.3" level 2 and so on;
+            all-caps titles count as top-level sections.
+    """
+    match = ARTICLE_PATTERN.match(line)
+    if match:
+        return 0, f"Article {match.group(2)}"
+
+    match = SECTION_PATTERN.match(line) or NUMBERED_PATTERN.match(line)
+    if match:
+        number = match.group(1)
+        # Reject things like years or amounts at the start of a wrapped line
+        if len(number.split(".")[0]) > 3:
+            return None
+        return number.count(".") + 1, f"Section {number}"
+
+    match = CAPS_HEADING_PATTERN.match(line)
+    if match and len(match.group(1).split()) <= 8:
+        return 1, match.group(1).strip().title()
+
+    return None
+
+
+class ClauseSplitter:
+    """
+    Structural splitter emitting chunks aligned on contract clauses.
+
+    Pages are fed in order with `feed`; a clause may span pages and is
+    complete once the next heading is seen (or on `flush`). Consecutive
+    clauses under the same parent heading (12.1, 12.2, ... of Section 12) are
+    packed into one chunk of up to `max_chars`, so short sub-clauses do not
+    each cost a chunk. Each chunk carries the `section_path` of the heading
+    its clauses share (e.g. "Article V > Section 12") and the labels of the
+    packed clauses as `clauses` in metadata.
+    """
+
+    def __init__(self, max_chars: int = MAX_CLAUSE_CHARS, min_chars: int = MIN_CLAUSE_CHARS):
+        self.max_chars = max_chars
+        self.min_chars = min_chars
+        # Pieces of a long clause keep the clause's own start_index
+        self.fallback = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+        self._path: List[Tuple[int, str]] = []
+        self._lines: List[str] = []
+        self._metadata: Optional[dict] = None
+        self._start_index = 0
+        # Completed clauses waiting to be packed: (text, metadata, heading path)
+        self._pack: List[Tuple[str, dict, Tuple[str, ...]]] = []
+        self._scope: Tuple[str, ...] = ()
+
+    def _close_clause(self, force: bool = False) -> List[Document]:
+        text = "\n".join(self._lines).strip()
+        if not text or (len(text) < self.min_chars and not force):
+            # Keep accumulating: a bare heading belongs with the clause after it
+            return []
+
+        path = tuple(label for _, label in self._path)
+        metadata = {**(self._metadata or {}), "start_index": self._start_index}
+        self._lines = []
+        self._metadata = None
+
+        if len(text) > self.max_chars:
+            chunks = self._emit_pack()
+            metadata.update(section_path=" > ".join(path) or "Preamble", section=path[-1] if path else "Preamble",
+                            clauses=path[-1] if path else "Preamble")
+            return chunks + self.fallback.split_documents([Document(page_content=text, metadata=metadata)])
+
+        chunks = []
+        size = sum(len(packed) + 1 for packed, _, _ in self._pack) + len(text)
+        fits = self._pack and self._scope and path[:len(self._scope)] == self._scope and size <= self.max_chars
+        if not fits:
+            chunks = self._emit_pack()
+            # A top-level clause scopes its own sub-clauses, a sub-clause its siblings
+            self._scope = path[:-1] if len(path) > 1 else path
+        self._pack.append((text, metadata, path))
+        return chunks
+
+    def _emit_pack(self) -> List[Document]:
+        if not self._pack:
+            return []
+        texts = [text for text, _, _ in self._pack]
+        paths = [path for _, _, path in self._pack]
+        # The deepest heading every packed clause is under
+        common = paths[0] if len(paths) == 1 else self._scope
+        metadata = {
+            **self._pack[0][1],
+            "section_path": " > ".join(common) or "Preamble",
+            "section": common[-1] if common else "Preamble",
+            "clauses": " | ".join(path[-1] if path else "Preamble" for path in paths),
+        }
+        self._pack = []
+        return [Document(page_content="\n".join(texts), metadata=metadata)]
+
+    def feed(self, page: Document) -> List[Document]:
+        """Consume one page and return the chunks it completed"""
+        chunks = []
+        offset = 0
+        for line in page.page_content.splitlines():
+            heading = parse_heading(line)
+            if heading is not None:
+                chunks.extend(self._close_clause())
+                level, label = heading
+                while self._path and self._path[-1][0] >= level:
+                    self._path.pop()
+                self._path.append((level, label))
+
+            if self._metadata is None:
+                # The clause starts here: remember where for citations
+                self._metadata = dict(page.metadata)
+                self._start_index = offset
+            self._lines.append(line)
+            offset += len(line) + 1
+        return chunks
+
+    def flush(self) -> List[Document]:
+        """Return the last, still open chunk"""
+        return self._close_clause(force=True) + self._emit_pack()
@@ -0,0 +1,86 @@
+import hashlib
+import sqlite3
+import threading
+from array import array
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from metrics import cache_lookup
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that keeps a persistent chunk-text -> vector cache.
+
+    Vectors are keyed by the SHA-256 of the model name and the text, so a chunk
+    that was embedded once (for example a clause shared by many contract
+    templates) is never sent to the embedding API again.
+    """
+
+    def __init__(self, underlying: Embeddings, cache_path: str, namespace: str):
+        self.underlying = underlying
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> dict:
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def _store(self, items: dict):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, array("f", vector).tobytes()) for key, vector in items.items()],
+            )
+            self._conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        cached = self._lookup(list(set(keys)))
+
+        # Only embed texts we have never seen, each distinct text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        cache_lookup("embedding", hit=True, count=len(keys) - len(missing))
+        cache_lookup("embedding", hit=False, count=len(missing))
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self._store(fresh)
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(f"query\x00{text}")
+        cached = self._lookup([key])
+        cache_lookup("embedding_query", hit=key in cached)
+        if key in cached:
+            return cached[key]
+
+        vector = self.underlying.embed_query(text)
+        self._store({key: vector})
+        return vector
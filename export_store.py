@@ -0,0 +1,294 @@
+"""
+Columnar store of extraction and audit results, for analytics.
+
+Every freshly computed `Extract` (one row per extraction) and `Audit` (one
+row per risky clause) is appended to Parquet files partitioned by the
+document's ingestion date, Hive style:
+
+    docs/exports/extract/ingest_date=2024-05-01/part-<time>-<id>.parquet
+    docs/exports/audit/ingest_date=2024-05-01/part-<time>-<id>.parquet
+
+Rows are buffered and written as a new part file every EXPORT_FLUSH_ROWS
+rows or EXPORT_FLUSH_SECONDS seconds, so files are never rewritten. The
+directories can be read directly (pandas, DuckDB, Spark, `pq.read_table`)
+or streamed through `GET /export/{kind}`. Re-running an extraction appends
+a new row: keep the latest `recorded_at` per document for current values.
+
+Many small part files can be merged offline with:
+
+    python export_store.py --compact
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional, get_origin
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from models import Extract
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+EXPORT_DIR = Path(os.environ.get("EXPORT_DIR", "docs/exports"))
+EXPORT_RECORDS = os.environ.get("EXPORT_RECORDS", "true").lower() in ("1", "true", "yes")
+EXPORT_FLUSH_ROWS = int(os.environ.get("EXPORT_FLUSH_ROWS", "500"))  # buffered rows that trigger a write
+EXPORT_FLUSH_SECONDS = float(os.environ.get("EXPORT_FLUSH_SECONDS", "30"))  # longest a row stays buffered
+EXPORT_BATCH_ROWS = 10000  # rows per record batch when reading back
+
+TIMESTAMP = pa.timestamp("ms", tz="UTC")
+DOCUMENT_COLUMNS = [
+    pa.field("document_id", pa.string()),
+    pa.field("name", pa.string()),
+    pa.field("sha256", pa.string()),
+    pa.field("ingested_at", TIMESTAMP),
+    pa.field("recorded_at", TIMESTAMP),
+]
+
+# One column per Extract field: lists of names stay lists
+EXTRACT_SCHEMA = pa.schema(DOCUMENT_COLUMNS + [pa.field("mode", pa.string())] + [
+    pa.field(name, pa.list_(pa.string()) if get_origin(field.annotation) in (list, List) else pa.string())
+    for name, field in Extract.model_fields.items()
+])
+
+# One row per risky clause; an audit that found nothing is one row with no finding
+AUDIT_SCHEMA = pa.schema(DOCUMENT_COLUMNS + [
+    pa.field("method", pa.string()),
+    pa.field("risk_index", pa.int32()),
+    pa.field("finding", pa.string()),
+    pa.field("severity", pa.string()),
+    pa.field("evidence", pa.string()),
+])
+
+PARTITION_KEY = "ingest_date"
+
+
+def _timestamp(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value, tz=timezone.utc) if value is not None else None
+
+
+def _ingest_date(document: dict) -> str:
+    # /extract/batch can finish extracting before ingestion does
+    ingested = document.get("ingested_at") or document.get("uploaded_at") or time.time()
+    return datetime.fromtimestamp(ingested, tz=timezone.utc).date().isoformat()
+
+
+def _conform(batch: pa.RecordBatch, schema: pa.Schema) -> pa.RecordBatch:
+    """Columns in `schema` order; columns missing from older files are null"""
+    columns = [
+        batch.column(field.name).cast(field.type) if field.name in batch.schema.names else pa.nulls(batch.num_rows, field.type)
+        for field in schema
+    ]
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+class RecordStore:
+    """Append-only Parquet dataset of one kind of record, partitioned by ingestion date"""
+
+    def __init__(self, kind: str, schema: pa.Schema):
+        self.kind = kind
+        self.schema = schema
+        self._lock = threading.Lock()
+        self._buffer: dict[str, List[dict]] = {}
+        self._buffered = 0
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def path(self) -> Path:
+        return EXPORT_DIR / self.kind
+
+    def append(self, rows: List[dict], ingest_date: str):
+        with self._lock:
+            self._buffer.setdefault(ingest_date, []).extend(rows)
+            self._buffered += len(rows)
+            full = self._buffered >= EXPORT_FLUSH_ROWS
+            if not full and self._timer is None:
+                self._timer = threading.Timer(EXPORT_FLUSH_SECONDS, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows, one new part file per ingestion date"""
+        with self._lock:
+            buffer, self._buffer, self._buffered = self._buffer, {}, 0
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            for ingest_date, rows in buffer.items():
+                directory = self.path / f"{PARTITION_KEY}={ingest_date}"
+                directory.mkdir(parents=True, exist_ok=True)
+                path = directory / f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+                # Readers only ever see complete files
+                tmp = path.with_suffix(".parquet.tmp")
+                pq.write_table(pa.Table.from_pylist(rows, schema=self.schema), tmp)
+                os.replace(tmp, path)
+            if buffer:
+                logger.info(f"Wrote {sum(len(rows) for rows in buffer.values())} {self.kind} records")
+
+    def partitions(self, since: Optional[str] = None, until: Optional[str] = None) -> List[Path]:
+        """Partition directories, oldest first, with since <= ingest date <= until (YYYY-MM-DD)"""
+        selected = []
+        for directory in sorted(self.path.glob(f"{PARTITION_KEY}=*")):
+            ingest_date = directory.name.split("=", 1)[1]
+            if (since is None or ingest_date >= since) and (until is None or ingest_date <= until):
+                selected.append(directory)
+        return selected
+
+    def iter_batches(self, since: Optional[str] = None, until: Optional[str] = None) -> Iterator[pa.RecordBatch]:
+        """
+        Read the records back, ingestion date partition by partition, with the
+        partition value as an `ingest_date` column. Buffered rows are written first.
+        """
+        self.flush()
+        schema = self.output_schema
+        for directory in self.partitions(since, until):
+            ingest_date = directory.name.split("=", 1)[1]
+            for path in sorted(directory.glob("*.parquet")):
+                for batch in pq.ParquetFile(path).iter_batches(batch_size=EXPORT_BATCH_ROWS):
+                    batch = _conform(batch, self.schema)
+                    yield pa.RecordBatch.from_arrays(
+                        batch.columns + [pa.array([ingest_date] * batch.num_rows, pa.string())], schema=schema
+                    )
+
+    @property
+    def output_schema(self) -> pa.Schema:
+        return self.schema.append(pa.field(PARTITION_KEY, pa.string()))
+
+    def compact(self) -> int:
+        """Merge every partition's part files into one; returns the files removed. Run offline."""
+        self.flush()
+        removed = 0
+        for directory in self.partitions():
+            parts = sorted(directory.glob("*.parquet"))
+            if len(parts) < 2:
+                continue
+            table = pa.Table.from_batches(
+                [_conform(batch, self.schema) for path in parts for batch in pq.ParquetFile(path).iter_batches()],
+                schema=self.schema,
+            )
+            path = directory / f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+            tmp = path.with_suffix(".parquet.tmp")
+            pq.write_table(table, tmp)
+            os.replace(tmp, path)
+            for part in parts:
+                part.unlink()
+            removed += len(parts) - 1
+        return removed
+
+
+extract_records = RecordStore("extract", EXTRACT_SCHEMA)
+audit_records = RecordStore("audit", AUDIT_SCHEMA)
+STORES = {"extract": extract_records, "audit": audit_records}
+
+
+def _document_columns(document: dict) -> dict:
+    return {
+        "document_id": document["id"],
+        "name": document["name"],
+        "sha256": document["sha256"],
+        "ingested_at": _timestamp(document.get("ingested_at")),
+        "recorded_at": datetime.now(timezone.utc),
+    }
+
+
+def record_extract(document: dict, data: dict, mode: str):
+    """Append a fresh extraction result; never raises, exporting must not fail the request"""
+    if not EXPORT_RECORDS:
+        return
+    try:
+        row = {**_document_columns(document), "mode": mode}
+        row.update({name: data.get(name) for name in Extract.model_fields})
+        extract_records.append([row], _ingest_date(document))
+    except Exception as e:
+        logger.warning(f"Could not export extraction of {document.get('name')}: {str(e)}")
+
+
+def record_audit(document: dict, data: dict, method: str):
+    """Append a fresh audit result, one row per risk; never raises"""
+    if not EXPORT_RECORDS:
+        return
+    try:
+        base = {**_document_columns(document), "method": method}
+        risks = data.get("risks") or [{}]
+        rows = [
+            {**base, "risk_index": i if risk else None, "finding": risk.get("finding"),
+             "severity": risk.get("severity"), "evidence": risk.get("evidence")}
+            for i, risk in enumerate(risks)
+        ]
+        audit_records.append(rows, _ingest_date(document))
+    except Exception as e:
+        logger.warning(f"Could not export audit of {document.get('name')}: {str(e)}")
+
+
+def flush_all():
+    for store in STORES.values():
+        try:
+            store.flush()
+        except Exception as e:
+            logger.error(f"Flushing {store.kind} records failed: {str(e)}")
+
+
+class ChunkSink:
+    """Write-only file object handing out what was written so far, to stream a Parquet file"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def stream_parquet(store: RecordStore, since: Optional[str] = None, until: Optional[str] = None) -> Iterator[bytes]:
+    """The selected records as one Parquet file, sent row group by row group"""
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, store.output_schema)
+    for batch in store.iter_batches(since, until):
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the Parquet export of extraction and audit records")
+    parser.add_argument("--compact", action="store_true", help="merge each partition's part files into one")
+    args = parser.parse_args(argv)
+    if not args.compact:
+        parser.print_help()
+        return 0
+
+    logging.basicConfig(level=logging.INFO)
+    for store in STORES.values():
+        logger.info(f"Compacted {store.kind} records: {store.compact()} files removed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
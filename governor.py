@@ -0,0 +1,373 @@
+import os
+import re
+import math
+import time
+import heapq
+import random
+import asyncio
+import logging
+import itertools
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, List, Optional, TypeVar
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.embeddings import Embeddings
+from langchain_core.exceptions import ModelRateLimitError
+from prometheus_client import Counter, Gauge, Histogram
+
+from metrics import LATENCY_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Configuration
+LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", "8"))
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("LLM_REQUESTS_PER_MINUTE", "0"))  # 0 = no rate limit
+EMBED_MAX_IN_FLIGHT = int(os.environ.get("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_REQUESTS_PER_MINUTE = float(os.environ.get("EMBED_REQUESTS_PER_MINUTE", "0"))
+RATE_LIMIT_RETRIES = int(os.environ.get("RATE_LIMIT_RETRIES", "5"))
+BACKOFF_BASE = 1.0  # seconds, doubled on every retry
+BACKOFF_MAX = 60.0
+
+GOVERNOR_WAIT_SECONDS = Histogram(
+    "contract_governor_wait_seconds",
+    "Time spent queued for a model slot",
+    ["governor", "priority"],
+    buckets=LATENCY_BUCKETS,
+)
+GOVERNOR_IN_FLIGHT = Gauge("contract_governor_in_flight", "Model calls holding a slot", ["governor"])
+GOVERNOR_QUEUED = Gauge("contract_governor_queued", "Model calls waiting for a slot", ["governor"])
+GOVERNOR_RATE_LIMITED = Counter("contract_governor_rate_limited", "Rate limit (429) errors seen", ["governor"])
+
+
+class Priority(IntEnum):
+    """Scheduling class of a model call: lower values are served first"""
+
+    INTERACTIVE = 0  # /rag, /ask, /query: a user is waiting on the answer
+    BATCH = 1  # /extract, /audit and the precompute jobs they may join
+    BACKGROUND = 2  # ingestion jobs
+
+
+_priority: ContextVar[Optional[Priority]] = ContextVar("model_call_priority", default=None)
+
+
+@contextmanager
+def priority(level: Priority):
+    """Run the enclosed model calls at `level`, overriding the callee's default"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority(default: Priority) -> Priority:
+    level = _priority.get()
+    return default if level is None else level
+
+
+# Fallback for errors that only carry the HTTP/gRPC status in their text:
+# 429 next to its status text, or the gRPC status name on its own
+RATE_LIMIT_MESSAGE = re.compile(
+    r"\b429\b\W{0,3}(?:Too Many Requests|RESOURCE_EXHAUSTED)|\bRESOURCE_EXHAUSTED\b|"
+    r"(?:error code|status code|status)\W{0,3}429\b",
+    re.IGNORECASE,
+)
+
+
+def is_rate_limit(error: BaseException) -> bool:
+    """
+    Whether `error` is a quota / rate limit rejection, decided on its type or
+    status attributes (google-genai's `code`/`status`, HTTP clients'
+    `status_code`), also through the errors it wraps (`raise ... from e`).
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, ModelRateLimitError):
+            return True
+        if 429 in (getattr(error, "status_code", None), getattr(error, "code", None)):
+            return True
+        if getattr(error, "status", None) == "RESOURCE_EXHAUSTED":
+            return True
+        if RATE_LIMIT_MESSAGE.search(str(error)):
+            return True
+        error = error.__cause__
+    return False
+
+
+class _Waiter:
+    """A queued acquire; woken through a threading.Event or, for coroutines, an asyncio.Event"""
+
+    def __init__(self, level: Priority, seq: int, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.key = (int(level), seq)
+        self.loop = loop
+        self.event = asyncio.Event() if loop else threading.Event()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return self.key < other.key
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self.event.set)
+
+
+class Governor:
+    """
+    Process-wide scheduler for calls to one model endpoint.
+
+    Bounds concurrent calls (`max_in_flight`) and their rate (token bucket of
+    `requests_per_minute`, bursting up to `max_in_flight`); waiting calls are
+    served by priority, then in arrival order. Works from threads and from
+    coroutines alike. Rate limit errors are retried with jittered exponential
+    backoff, and also pause every other caller for the backoff delay so the
+    whole process eases off the quota.
+    """
+
+    def __init__(self, name: str, max_in_flight: int, requests_per_minute: float = 0.0,
+                 retries: int = RATE_LIMIT_RETRIES):
+        self.name = name
+        self.max_in_flight = max(1, max_in_flight)
+        self.rate = requests_per_minute / 60.0
+        self.burst = float(self.max_in_flight)
+        self.retries = retries
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    # Slot bookkeeping, called with the lock held
+
+    def _refill(self, now: float):
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _try_acquire(self, waiter: _Waiter) -> Optional[float]:
+        """Take a slot for `waiter` if it is its turn; otherwise return how long to wait"""
+        now = time.monotonic()
+        self._refill(now)
+        if self._waiters[0] is not waiter or self._in_flight >= self.max_in_flight:
+            return math.inf  # woken when a slot frees up or the queue moves
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.rate and self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+
+        heapq.heappop(self._waiters)
+        self._in_flight += 1
+        if self.rate:
+            self._tokens -= 1
+        self._wake_next()
+        return None
+
+    def _wake_next(self):
+        if self._waiters:
+            self._waiters[0].wake()
+
+    def _enqueue(self, waiter: _Waiter):
+        with self._lock:
+            heapq.heappush(self._waiters, waiter)
+            GOVERNOR_QUEUED.labels(self.name).set(len(self._waiters))
+
+    def _dequeue(self, waiter: _Waiter):
+        # The acquire was cancelled: leave the queue and let the next one try
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+            GOVERNOR_QUEUED.labels(self.name).set(len(self._waiters))
+            self._wake_next()
+
+    def _acquired(self, level: Priority, start: float):
+        GOVERNOR_WAIT_SECONDS.labels(self.name, level.name.lower()).observe(time.monotonic() - start)
+        GOVERNOR_IN_FLIGHT.labels(self.name).inc()
+        GOVERNOR_QUEUED.labels(self.name).set(len(self._waiters))
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._wake_next()
+        GOVERNOR_IN_FLIGHT.labels(self.name).dec()
+
+    def acquire(self, level: Priority):
+        """Block the calling thread until a slot is granted"""
+        start = time.monotonic()
+        waiter = _Waiter(level, next(self._seq))
+        self._enqueue(waiter)
+        try:
+            while True:
+                with self._lock:
+                    delay = self._try_acquire(waiter)
+                if delay is None:
+                    break
+                waiter.event.wait(None if delay == math.inf else delay)
+                waiter.event.clear()
+        except BaseException:
+            self._dequeue(waiter)
+            raise
+        self._acquired(level, start)
+
+    async def aacquire(self, level: Priority):
+        """Wait, without blocking the event loop, until a slot is granted"""
+        start = time.monotonic()
+        waiter = _Waiter(level, next(self._seq), loop=asyncio.get_running_loop())
+        self._enqueue(waiter)
+        try:
+            while True:
+                with self._lock:
+                    delay = self._try_acquire(waiter)
+                if delay is None:
+                    break
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), None if delay == math.inf else delay)
+                except asyncio.TimeoutError:
+                    pass
+                waiter.event.clear()
+        except BaseException:
+            self._dequeue(waiter)
+            raise
+        self._acquired(level, start)
+
+    @contextmanager
+    def slot(self, level: Priority):
+        self.acquire(level)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self, level: Priority):
+        await self.aacquire(level)
+        try:
+            yield
+        finally:
+            self.release()
+
+    # Retries
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        """Delay before retry `attempt` (0-based); raises `error` once retries are exhausted"""
+        GOVERNOR_RATE_LIMITED.labels(self.name).inc()
+        if attempt >= self.retries:
+            raise error
+        # "Full jitter" exponential backoff
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        logger.warning(f"{self.name} rate limited, retry {attempt + 1}/{self.retries} in {delay:.1f}s")
+        return delay
+
+    def call(self, fn: Callable[..., T], *args, default: Priority = Priority.BATCH, **kwargs) -> T:
+        """Run `fn(*args, **kwargs)` in a slot, retrying rate limit errors"""
+        level = current_priority(default)
+        for attempt in itertools.count():
+            try:
+                with self.slot(level):
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limit(e):
+                    raise
+                time.sleep(self._backoff(attempt, e))
+        raise AssertionError("unreachable")
+
+    async def acall(self, fn: Callable[..., Awaitable[T]], *args, default: Priority = Priority.BATCH, **kwargs) -> T:
+        """Async version of `call`: `fn` returns an awaitable"""
+        level = current_priority(default)
+        for attempt in itertools.count():
+            try:
+                async with self.aslot(level):
+                    return await fn(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limit(e):
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+        raise AssertionError("unreachable")
+
+    def stream(self, fn: Callable[..., Iterator[T]], *args, default: Priority = Priority.INTERACTIVE, **kwargs) -> Iterator[T]:
+        """
+        Iterate `fn(*args, **kwargs)` holding a slot for the whole stream. A
+        rate limit error is retried only before the first chunk was yielded.
+        """
+        level = current_priority(default)
+        for attempt in itertools.count():
+            started = False
+            try:
+                with self.slot(level):
+                    for chunk in fn(*args, **kwargs):
+                        started = True
+                        yield chunk
+                return
+            except Exception as e:
+                if started or not is_rate_limit(e):
+                    raise
+                time.sleep(self._backoff(attempt, e))
+
+    async def astream(self, fn: Callable[..., AsyncIterator[T]], *args, default: Priority = Priority.INTERACTIVE,
+                      **kwargs) -> AsyncIterator[T]:
+        """Async version of `stream`"""
+        level = current_priority(default)
+        for attempt in itertools.count():
+            started = False
+            try:
+                async with self.aslot(level):
+                    async for chunk in fn(*args, **kwargs):
+                        started = True
+                        yield chunk
+                return
+            except Exception as e:
+                if started or not is_rate_limit(e):
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+
+
+llm_governor = Governor("llm", LLM_MAX_IN_FLIGHT, LLM_REQUESTS_PER_MINUTE)
+embedding_governor = Governor("embeddings", EMBED_MAX_IN_FLIGHT, EMBED_REQUESTS_PER_MINUTE)
+
+
+class GovernedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper routing every call through a governor. Document
+    batches default to background priority (ingestion), queries to interactive.
+    """
+
+    def __init__(self, underlying: Embeddings, governor: Governor = embedding_governor):
+        self.underlying = underlying
+        self.governor = governor
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.governor.call(self.underlying.embed_documents, texts, default=Priority.BACKGROUND)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.governor.call(self.underlying.embed_query, text, default=Priority.INTERACTIVE)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.governor.acall(self.underlying.aembed_documents, texts, default=Priority.BACKGROUND)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.governor.acall(self.underlying.aembed_query, text, default=Priority.INTERACTIVE)
+
+
+class GovernorMiddleware(AgentMiddleware):
+    """Agent middleware sending each model call of the agent loop through a governor"""
+
+    def __init__(self, governor: Governor = llm_governor, default: Priority = Priority.INTERACTIVE):
+        super().__init__()
+        self.governor = governor
+        self.default = default
+
+    def wrap_model_call(self, request, handler) -> Any:
+        return self.governor.call(handler, request, default=self.default)
+
+    async def awrap_model_call(self, request, handler) -> Any:
+        return await self.governor.acall(handler, request, default=self.default)
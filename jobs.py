@@ -0,0 +1,112 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "2"))
+PRECOMPUTE_WORKERS = int(os.environ.get("PRECOMPUTE_WORKERS", "4"))
+MAX_TRACKED_JOBS = 1000  # finished jobs beyond this are forgotten, oldest first
+
+
+class JobQueue:
+    """
+    Runs ingestion jobs on a background worker pool and tracks their progress.
+
+    Each job function is called with a `progress(stage, **info)` keyword argument
+    that it can use to report what it is currently doing (parse, split, embed...).
+    """
+
+    def __init__(self, max_workers: int = INGEST_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs: dict[str, dict] = {}
+        self._futures: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> str:
+        """Enqueue `fn(*args, **kwargs)` and return the id of the new job"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "stage": "queued",
+                "progress": {},
+                "result": None,
+                "error": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+            self._prune()
+
+        future = self._executor.submit(self._run, job_id, fn, args, kwargs)
+        with self._lock:
+            self._futures[job_id] = future
+        return job_id
+
+    def future(self, job_id: str) -> Optional[Future]:
+        """
+        Return a future resolving to the job's result, or raising its error,
+        for callers that want to wait on the job rather than poll it.
+        """
+        with self._lock:
+            return self._futures.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Return a snapshot of the job state, or None if the job is unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {**job, "progress": dict(job["progress"])}
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            progress = fields.pop("progress", None)
+            if progress:
+                job["progress"].update(progress)
+            job.update(fields)
+            job["updated_at"] = time.time()
+
+    def _run(self, job_id: str, fn: Callable, args: tuple, kwargs: dict):
+        self._update(job_id, status="running")
+
+        def progress(stage: str, **info):
+            self._update(job_id, stage=stage, progress={stage: info} if info else None)
+
+        try:
+            result = fn(*args, progress=progress, **kwargs)
+            self._update(job_id, status="completed", stage="done", result=result)
+            logger.info(f"Job {job_id} completed")
+            return result
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            self._update(job_id, status="failed", error=str(e))
+            raise
+
+    def _prune(self):
+        # Called with the lock held
+        if len(self._jobs) <= MAX_TRACKED_JOBS:
+            return
+        finished = sorted(
+            (job for job in self._jobs.values() if job["status"] in ("completed", "failed")),
+            key=lambda job: job["updated_at"],
+        )
+        for job in finished[: len(self._jobs) - MAX_TRACKED_JOBS]:
+            del self._jobs[job["job_id"]]
+            self._futures.pop(job["job_id"], None)
+
+
+ingest_queue = JobQueue()
+
+# Speculative extract/audit calls started after ingestion
+precompute_pool = ThreadPoolExecutor(max_workers=PRECOMPUTE_WORKERS, thread_name_prefix="precompute")
@@ -0,0 +1,40 @@
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """
+    Thread-safe, create-on-first-use holder for an expensive resource (model
+    clients, vector store connections...), so importing a module stays cheap.
+    """
+
+    def __init__(self, factory: Callable[[], T], name: str):
+        self._factory = factory
+        self.name = name
+        self._value: Optional[T] = None
+        self._lock = threading.Lock()
+
+    def __call__(self) -> T:
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    self._value = self._factory()
+        return self._value # type: ignore
+
+    @property
+    def ready(self) -> bool:
+        return self._value is not None
+
+    def set(self, value: T):
+        """Replace the resource, e.g. with a stand-in implementation"""
+        with self._lock:
+            self._value = value
+
+
+def lazy(name: str) -> Callable[[Callable[[], T]], Lazy[T]]:
+    """Decorator turning a zero-argument factory into a `Lazy` resource"""
+    def wrap(factory: Callable[[], T]) -> Lazy[T]:
+        return Lazy(factory, name)
+    return wrap
@@ -0,0 +1,120 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# Configuration
+LEXICAL_DIR = Path(os.environ.get("LEXICAL_INDEX_DIR", "./chroma_langchain_db/lexical"))
+LEXICAL_CACHE_SIZE = 64  # per-document indexes kept in memory
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Keeps clause numbers ("12.3", "4(a)") and amounts ("1,000,000") as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,/-][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class LexicalIndex:
+    """In-memory BM25 inverted index over one document's chunks"""
+
+    def __init__(self, chunks: List[dict]):
+        self.chunks = chunks
+        self.postings: dict[str, List[Tuple[int, int]]] = {}
+        self.lengths: List[int] = []
+
+        for i, chunk in enumerate(chunks):
+            terms = Counter(tokenize(chunk["page_content"]))
+            self.lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self.postings.setdefault(term, []).append((i, tf))
+
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def search(self, query: str, k: int) -> List[Tuple[Document, float]]:
+        n = len(self.chunks)
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[i] / self.avg_length)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [
+            (Document(page_content=self.chunks[i]["page_content"], metadata=self.chunks[i]["metadata"]), score)
+            for i, score in best
+        ]
+
+
+_cache: "OrderedDict[str, LexicalIndex]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _index_path(document_id: str) -> Path:
+    return LEXICAL_DIR / f"{document_id}.json"
+
+
+def build_index(document_id: str, chunks: List[Document]):
+    """Persist the chunks of a document and cache their lexical index"""
+    data = [{"page_content": chunk.page_content, "metadata": chunk.metadata} for chunk in chunks]
+    LEXICAL_DIR.mkdir(parents=True, exist_ok=True)
+
+    # Write then rename, so readers never see a partial index
+    path = _index_path(document_id)
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+    with _cache_lock:
+        _cache[document_id] = LexicalIndex(data)
+        _cache.move_to_end(document_id)
+        while len(_cache) > LEXICAL_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def get_index(document_id: str) -> Optional[LexicalIndex]:
+    """Return the lexical index of a document, or None if it has none"""
+    with _cache_lock:
+        index = _cache.get(document_id)
+        if index is not None:
+            _cache.move_to_end(document_id)
+            return index
+
+    path = _index_path(document_id)
+    if not path.exists():
+        return None
+    with open(path, "r") as f:
+        index = LexicalIndex(json.load(f))
+
+    with _cache_lock:
+        _cache[document_id] = index
+        while len(_cache) > LEXICAL_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
+
+
+def delete_index(document_id: str):
+    with _cache_lock:
+        _cache.pop(document_id, None)
+    _index_path(document_id).unlink(missing_ok=True)
+
+
+def search(document_id: str, query: str, k: int) -> List[Tuple[Document, float]]:
+    """BM25 search over a document's chunks; empty if it was never indexed"""
+    index = get_index(document_id)
+    if index is None:
+        return []
+    return index.search(query, k)
@@ -3,19 +3,81 @@ from langchain.messages import ToolMessage, AIMessage, SystemMessage, HumanMessa
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.agents import create_agent
-from prompts import rag_prompt, llm_prompt
-from rag import retrieve_context
-from models import Extract, Audit
+from prompts import rag_prompt, llm_prompt, query_prompt, extract_system_prompt, extract_user_prompt, audit_system_prompt, audit_user_prompt
+from prompts import extract_field_system_prompt, extract_field_user_prompt, audit_section_system_prompt, audit_section_user_prompt
+from result_cache import make_key
+from rag import retrieve_context, RetrievalContext, search_document, require_api_key
+from lazy import lazy
+from metrics import llm_config, timed
+from governor import llm_governor, GovernorMiddleware, Priority
+from models import Extract, Audit, RiskyClause
+from pdf_parsing import iter_pages
+from clause_splitter import ClauseSplitter
+from langchain_core.documents import Document
+import lexical
+import risk_scanner
+from pydantic import BaseModel, create_model
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional
 from dotenv import load_dotenv
+import asyncio
 import base64
+import contextvars
 import os
+import re
 load_dotenv()
 
-model = init_chat_model("google_genai:gemini-2.5-flash-lite")
+MODEL_NAME = "google_genai:gemini-2.5-flash-lite"
 
-model_with_structured_output = model.with_structured_output(Extract)
+# Configuration
+EXTRACT_MODE = os.environ.get("EXTRACT_MODE", "full")  # "full", "retrieval" or "auto"
+EXTRACT_AUTO_PAGES = int(os.environ.get("EXTRACT_AUTO_PAGES", "40"))  # "auto" uses retrieval from this many pages
+EXTRACT_TOP_K = int(os.environ.get("EXTRACT_TOP_K", "4"))  # chunks retrieved per field in retrieval mode
+AUDIT_SECTION_CHARS = int(os.environ.get("AUDIT_SECTION_CHARS", "8000"))  # contract text per section in /audit/stream
+AUDIT_PREFILTER = os.environ.get("AUDIT_PREFILTER", "false").lower() in ("1", "true", "yes")
+RISK_SCAN_NEIGHBOURS = int(os.environ.get("RISK_SCAN_NEIGHBOURS", "1"))  # chunks kept on each side of a scanner hit
 
-model_for_audit = model.with_structured_output(Audit)
+# Models and the agent are created on first use, so importing this module stays fast
+
+@lazy("model")
+def get_model():
+    require_api_key()
+    return init_chat_model(MODEL_NAME)
+
+@lazy("model_with_structured_output")
+def get_extract_model():
+    return get_model().with_structured_output(Extract)
+
+@lazy("model_for_audit")
+def get_audit_model():
+    return get_model().with_structured_output(Audit)
+
+
+def extract_cache_key(content_hash: str) -> str:
+    """Result cache key for an extraction of the document with this content hash"""
+    return make_key("extract", content_hash, MODEL_NAME, [extract_system_prompt, extract_user_prompt], Extract)
+
+
+def audit_stream_cache_key(content_hash: str) -> str:
+    """Result cache key for a section-by-section audit of the document with this content hash"""
+    return make_key(
+        "audit_stream", content_hash, MODEL_NAME,
+        [audit_section_system_prompt, audit_section_user_prompt, f"chars={AUDIT_SECTION_CHARS}"], Audit
+    )
+
+
+def extract_retrieval_cache_key(content_hash: str) -> str:
+    """Result cache key for a retrieval-mode extraction of the document with this content hash"""
+    return make_key(
+        "extract_retrieval", content_hash, MODEL_NAME,
+        [extract_field_system_prompt, extract_field_user_prompt, f"k={EXTRACT_TOP_K}"], Extract
+    )
+
+
+def audit_cache_key(content_hash: str) -> str:
+    """Result cache key for an audit of the document with this content hash"""
+    return make_key("audit", content_hash, MODEL_NAME, [audit_system_prompt, audit_user_prompt], Audit)
 
 
 def pdf_to_base64(pdf_path: str) -> str:
@@ -23,6 +85,24 @@ def pdf_to_base64(pdf_path: str) -> str:
     with open(pdf_path, 'rb') as f:
         return base64.b64encode(f.read()).decode('utf-8')
 
+def pdf_messages(system_prompt: str, user_prompt: str, pdf_file: str) -> list:
+    """Build the multimodal message list sending a base64 PDF to the model"""
+    return [{
+            "role": "system",
+            "content": system_prompt
+    },
+    {
+    "role": "user",
+    "content": [
+        {"type": "text", "text": user_prompt},
+        {
+            "type": "file",
+            "base64": pdf_file,
+            "mime_type": "application/pdf",
+        },
+    ]
+    }]
+
 def extract_from_pdf(pdf_path: str):
     """
     Extract structured data from PDF using Gemini 2.5 Flash Lite
@@ -48,24 +128,10 @@ def extract_from_pdf(pdf_path: str):
         pdf_file = pdf_to_base64(pdf_path)
 
         # Create message for model
-        message = [{
-                "role": "system",
-                "content": "Act as a legal contract expert and help extract useful information from the document. Extract all relevant contract details accurately."
-        },
-        {
-        "role": "user",
-        "content": [
-            {"type": "text", "text": "Extract all structured information from this contract document including parties, dates, terms, and all other relevant details."},
-            {
-                "type": "file",
-                "base64": pdf_file,
-                "mime_type": "application/pdf",
-            },
-        ]
-        }]
+        message = pdf_messages(extract_system_prompt, extract_user_prompt, pdf_file)
         
         # Invoke model
-        result = model_with_structured_output.invoke(message)
+        result = llm_governor.call(get_extract_model().invoke, message, config=llm_config("extract"))
 
         return result
     
@@ -73,8 +139,63 @@ def extract_from_pdf(pdf_path: str):
         raise Exception(f"Error extracting data from PDF: {str(e)}")
 
 
+# Retrieval mode: each Extract field is answered from the chunks retrieved
+# with its description as the query, instead of from the whole PDF
+
+@lru_cache(maxsize=None)
+def field_schema(name: str) -> type[BaseModel]:
+    """Single-field structured output schema for one Extract field"""
+    field = Extract.model_fields[name]
+    return create_model(f"Extract_{name}", **{name: (field.annotation, field)})
+
+
+def field_messages(name: str, citations: list) -> list:
+    description = Extract.model_fields[name].description
+    return [
+        SystemMessage(content=extract_field_system_prompt.format(citations="".join(citations))),
+        HumanMessage(content=extract_field_user_prompt.format(field=name.replace("_", " "), description=description)),
+    ]
+
+
+def extract_field(document_id: str, name: str, k: int = EXTRACT_TOP_K):
+    """Extract one field from the top-k chunks retrieved for its description"""
+    citations = retrieve_citations(Extract.model_fields[name].description, document_id, k=k)
+    result = llm_governor.call(
+        get_model().with_structured_output(field_schema(name)).invoke,
+        field_messages(name, citations), config=llm_config("extract_retrieval"),
+    )
+    return getattr(result, name)
+
+
+def extract_by_retrieval(document_id: str, k: int = EXTRACT_TOP_K) -> Extract:
+    """
+    Extract structured data from an ingested document without sending the PDF:
+    fields are extracted in parallel, each from its own top-k chunks, and
+    merged into one Extract.
+
+    Input tokens stay bounded by the number of fields times k chunks, however
+    long the contract is.
+    """
+    try:
+        with ThreadPoolExecutor(max_workers=len(Extract.model_fields)) as pool:
+            # Each task runs in a copy of this context, so a caller's priority applies
+            futures = {
+                name: pool.submit(contextvars.copy_context().run, extract_field, document_id, name, k)
+                for name in Extract.model_fields
+            }
+            return Extract(**{name: future.result() for name, future in futures.items()})
+
+    except Exception as e:
+        raise Exception(f"Error extracting data from document: {str(e)}")
+
+
 tools = [retrieve_context]
-agent = create_agent(model, tools, system_prompt=rag_prompt)
+
+@lazy("agent")
+def get_agent():
+    # Each model call of the agent loop goes through the governor at interactive priority
+    return create_agent(get_model(), tools, system_prompt=rag_prompt, context_schema=RetrievalContext,
+                        middleware=[GovernorMiddleware()])
 
 # query = (
 #     "Explain what is the contract about?\n\n"
@@ -87,66 +208,108 @@ agent = create_agent(model, tools, system_prompt=rag_prompt)
 # ):
 #     event["messages"][-1].pretty_print()
 
+def format_citations(documents):
+    citations = []
+    for i, document in enumerate(documents):
+        citation = f"CITATION {i+1}: \n\n"
+        citation += document.page_content
+        citation += f"\n\n{'='*30}\n\n"
+        citations.append(citation)
+    return citations
+
 def get_citations(output):
     citations = []
     for message in output["messages"]:
         if isinstance(message, ToolMessage):
-            for i, document in enumerate(message.artifact):
-                citation = f"CITATION {i+1}: \n\n"
-                citation += document.page_content
-                citation += f"\n\n{'='*30}\n\n"
-                citations.append(citation)
-                # print(document.page_content)
-                # print("\n\n")
+            citations.extend(format_citations(message.artifact))
     return citations
 
-def perform_rag(query: str):
+def perform_rag(query: str, document_id: str):
+    """
+    Run the retrieval agent for a query, scoped to a single document.
 
-    output = agent.invoke({"messages": [{"role": "user", "content": query}]})
+    Returns:
+        tuple: The agent's final answer and the citations it retrieved
+    """
+
+    # Every model call of the agent loop is observed as an "agent_turn"
+    with timed("agent"):
+        output = get_agent().invoke(
+            {"messages": [{"role": "user", "content": query}]},
+            config=llm_config("rag", stage="agent_turn"),
+            context=RetrievalContext(document_id=document_id),
+        )
     final_output = output["messages"][-1].content
     citations = get_citations(output)
     return final_output, citations
 
-def llm_response(query: str, context: dict):
-    
+def answer_messages(query: str, context: dict) -> list:
+    """Build the final-answer prompt from the agent output and citations"""
     agent_output = context.get("output", "")
     citations = "".join(context.get("citations", []))
 
-    messages = [
+    return [
         SystemMessage(content=llm_prompt.format(
             agent_output=agent_output,
             citations=citations
         )),
         HumanMessage(content=query)
     ]
-    response = model.invoke(messages)
+
+def llm_response(query: str, context: dict):
+    
+    messages = answer_messages(query, context)
+    response = llm_governor.call(get_model().invoke, messages, config=llm_config("answer"), default=Priority.INTERACTIVE)
 
     return response
 
 
+def chunk_text(chunk) -> str:
+    content = getattr(chunk, "content", "")
+    # content may be str or list; coerce to str
+    return content if isinstance(content, str) else str(content)
+
+
 def llm_response_stream(query: str, context: dict):
     """
     Stream tokens from the LLM using the provided RAG context.
     Yields incremental text chunks.
     """
 
-    agent_output = context.get("output", "")
-    citations = "".join(context.get("citations", []))
+    messages = answer_messages(query, context)
 
-    messages = [
-        SystemMessage(content=llm_prompt.format(
-            agent_output=agent_output,
-            citations=citations
-        )),
+    # stream partial generations
+    for chunk in llm_governor.stream(get_model().stream, messages, config=llm_config("answer")):
+        content = chunk_text(chunk)
+        if content:
+            yield content
+
+def retrieve_citations(query: str, document_id: str, k: int = 4):
+    """
+    Single retrieval pass for the fused /query path: no agent loop, just the
+    top-k chunks of the document formatted as citations.
+    """
+    return format_citations(search_document(document_id, query, k=k))
+
+
+def query_messages(query: str, citations: list) -> list:
+    """Build the fused /query prompt straight from retrieved citations"""
+    return [
+        SystemMessage(content=query_prompt.format(citations="".join(citations))),
         HumanMessage(content=query)
     ]
 
-    # stream partial generations
-    for chunk in model.stream(messages):
-        content = getattr(chunk, "content", "")
+
+def answer_stream(query: str, citations: list):
+    """
+    Stream the final answer to a query straight from retrieved citations.
+    Yields incremental text chunks.
+    """
+
+    for chunk in llm_governor.stream(get_model().stream, query_messages(query, citations), config=llm_config("query")):
+        content = chunk_text(chunk)
         if content:
-            # content may be str or list; coerce to str
-            yield content if isinstance(content, str) else str(content)
+            yield content
 
 def llm_audit(pdf_path: str):
     
@@ -159,26 +322,316 @@ def llm_audit(pdf_path: str):
         pdf_file = pdf_to_base64(pdf_path)
 
         # Create message for model
-        message = [{
-                "role": "system",
-                "content": "Act as a legal contract expert. Analyse the uploaded contract thoroughly and help find out any risky clauses in the contract."
-        },
-        {
-        "role": "user",
-        "content": [
-            {"type": "text", "text": "Analyse the document and find out any risky clauses present in the contract"},
-            {
-                "type": "file",
-                "base64": pdf_file,
-                "mime_type": "application/pdf",
-            },
-        ]
-        }]
+        message = pdf_messages(audit_system_prompt, audit_user_prompt, pdf_file)
         
         # Invoke model
-        result = model_for_audit.invoke(message)
+        result = llm_governor.call(get_audit_model().invoke, message, config=llm_config("audit"))
 
         return result
     
     except Exception as e:
-        raise Exception(f"Error extracting data from PDF: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error extracting data from PDF: {str(e)}")
+
+
+# Section-parallel audit: the contract is cut into clause-aligned sections that
+# are audited concurrently, so findings arrive as each section completes
+
+SEVERITY_RANK = {"Low": 0, "Medium": 1, "High": 2, "Critical": 3}
+
+
+def parse_clauses(pdf_path: str) -> list:
+    """Parse a PDF into one Document per clause"""
+    splitter = ClauseSplitter()
+    clauses = []
+    for page in iter_pages(pdf_path):
+        clauses.extend(splitter.feed(page))
+    clauses.extend(splitter.flush())
+    return clauses
+
+
+def split_sections(pdf_path: str, max_chars: int = AUDIT_SECTION_CHARS) -> list:
+    """
+    Parse a PDF into sections of whole clauses, each up to `max_chars` long.
+
+    Returns:
+        list: dicts with the section `text` and the `pages` it spans (e.g. "3-5")
+    """
+    return pack_sections(parse_clauses(pdf_path), max_chars)
+
+
+def pack_sections(clauses: list, max_chars: int = AUDIT_SECTION_CHARS) -> list:
+    """Group consecutive clauses (Documents with a page) into sections of up to `max_chars`"""
+    sections = []
+    current, first_page, last_page = [], None, None
+    for clause in clauses:
+        size = sum(len(text) for text in current)
+        if current and size + len(clause.page_content) > max_chars:
+            sections.append({"text": "\n\n".join(current), "pages": f"{first_page + 1}-{last_page + 1}"})
+            current, first_page = [], None
+        current.append(clause.page_content)
+        first_page = clause.metadata["page"] if first_page is None else first_page
+        last_page = clause.metadata["page"]
+    if current:
+        sections.append({"text": "\n\n".join(current), "pages": f"{first_page + 1}-{last_page + 1}"})
+    return sections
+
+
+def section_messages(section: dict) -> list:
+    return [
+        SystemMessage(content=audit_section_system_prompt.format(pages=section["pages"], section=section["text"])),
+        HumanMessage(content=audit_section_user_prompt),
+    ]
+
+
+def _evidence_tokens(risk: RiskyClause) -> set:
+    return set(re.findall(r"\w+", risk.evidence.lower()))
+
+
+def merge_risks(risks: list) -> list:
+    """
+    Merge findings quoting the same clause (one evidence contained in the
+    other, or 80% of their words shared), keeping the higher severity.
+    """
+    merged = []
+    for risk in risks:
+        tokens = _evidence_tokens(risk)
+        for i, (kept, kept_tokens) in enumerate(merged):
+            overlap = len(tokens & kept_tokens) / max(1, min(len(tokens), len(kept_tokens)))
+            if overlap >= 0.8:
+                if SEVERITY_RANK[risk.severity] > SEVERITY_RANK[kept.severity]:
+                    merged[i] = (risk, tokens | kept_tokens)
+                break
+        else:
+            merged.append((risk, tokens))
+    return [risk for risk, _ in merged]
+
+
+def audit_section(section: dict, operation: str = "audit_stream") -> Audit:
+    return llm_governor.call(get_audit_model().invoke, section_messages(section), config=llm_config(operation))
+
+
+async def aaudit_section(section: dict, operation: str = "audit_stream") -> Audit:
+    return await llm_governor.acall(get_audit_model().ainvoke, section_messages(section), config=llm_config(operation))
+
+
+def audit_sections(sections: list, operation: str = "audit_stream") -> list:
+    """Audit sections concurrently from a thread; returns their findings merged"""
+    with ThreadPoolExecutor(max_workers=max(1, len(sections))) as pool:
+        futures = [
+            pool.submit(contextvars.copy_context().run, audit_section, section, operation)
+            for section in sections
+        ]
+        audits = [future.result() for future in futures]
+    return merge_risks([risk for audit in audits for risk in audit.risks])
+
+
+def llm_audit_sections(pdf_path: str) -> dict:
+    """
+    Blocking version of the `/audit/stream` audit, all sections at once: the
+    same result as `aaudit_stream`, for precompute to store under
+    `audit_stream_cache_key`
+    """
+    try:
+        return {"risks": [risk.model_dump() for risk in audit_sections(split_sections(pdf_path))]}
+
+    except Exception as e:
+        raise Exception(f"Error auditing document: {str(e)}")
+
+
+# Pre-filtered audit: a local rule-based scan picks the chunks with risky
+# wording, and only those (with their neighbours) are sent to the model
+
+def document_chunks(document_id: str, pdf_path: str) -> list:
+    """A document's chunks in order: from its keyword index if ingested, else parsed from the PDF"""
+    index = lexical.get_index(document_id)
+    if index is not None:
+        return index.chunks
+    return [{"page_content": clause.page_content, "metadata": clause.metadata} for clause in parse_clauses(pdf_path)]
+
+
+def prefilter_sections(document_id: str, pdf_path: str) -> tuple:
+    """
+    Scan a document for risky wording.
+
+    Returns:
+        tuple: The scanner hits, and the sections (as in `split_sections`)
+            made of the chunks with hits and their neighbours only
+    """
+    chunks = document_chunks(document_id, pdf_path)
+    hits = risk_scanner.scan(chunks)
+    indices = risk_scanner.candidate_indices(hits, len(chunks), RISK_SCAN_NEIGHBOURS)
+
+    candidates = []
+    for position, i in enumerate(indices):
+        text = chunks[i]["page_content"]
+        if position and indices[position - 1] != i - 1:
+            # Mark skipped text, so separate excerpts are not read as one clause
+            text = f"[...]\n{text}"
+        candidates.append(Document(page_content=text, metadata=chunks[i]["metadata"]))
+    return hits, pack_sections(candidates)
+
+
+def audit_prefilter_cache_key(content_hash: str) -> str:
+    """Result cache key for a pre-filtered audit of the document with this content hash"""
+    return make_key(
+        "audit_prefilter", content_hash, MODEL_NAME,
+        [audit_section_system_prompt, audit_section_user_prompt, risk_scanner.RULES_VERSION,
+         f"neighbours={RISK_SCAN_NEIGHBOURS}", f"chars={AUDIT_SECTION_CHARS}"], Audit
+    )
+
+
+def llm_audit_prefiltered(document_id: str, pdf_path: str) -> dict:
+    """
+    Audit only the candidate clauses found by the risk scanner.
+
+    Returns:
+        dict: The merged model `risks`, plus the scanner's own hits as
+            `preliminary` findings
+    """
+    try:
+        hits, sections = prefilter_sections(document_id, pdf_path)
+        risks = audit_sections(sections, "audit_prefilter")
+        return {"risks": [risk.model_dump() for risk in risks], "preliminary": risk_scanner.preliminary_findings(hits)}
+
+    except Exception as e:
+        raise Exception(f"Error auditing document: {str(e)}")
+
+
+async def allm_audit_prefiltered(document_id: str, pdf_path: str) -> dict:
+    """Async version of `llm_audit_prefiltered`"""
+    try:
+        hits, sections = await asyncio.to_thread(prefilter_sections, document_id, pdf_path)
+        audits = await asyncio.gather(*(aaudit_section(section, "audit_prefilter") for section in sections))
+        risks = merge_risks([risk for audit in audits for risk in audit.risks])
+        return {"risks": [risk.model_dump() for risk in risks], "preliminary": risk_scanner.preliminary_findings(hits)}
+
+    except Exception as e:
+        raise Exception(f"Error auditing document: {str(e)}")
+
+
+async def aaudit_stream(pdf_path: str, sections: Optional[list] = None):
+    """
+    Audit a contract section by section, concurrently.
+
+    Yields:
+        tuple: ("sections", count) first, then ("finding", section index,
+            RiskyClause) as each section completes (or ("section_error",
+            index, message)), and finally ("result", merged Audit)
+    """
+    if sections is None:
+        sections = await asyncio.to_thread(split_sections, pdf_path)
+    yield ("sections", len(sections))
+
+    async def audit(index: int, section: dict):
+        try:
+            return index, await aaudit_section(section), None
+        except Exception as e:
+            return index, None, e
+
+    tasks = [asyncio.ensure_future(audit(i, section)) for i, section in enumerate(sections)]
+    findings = []
+    try:
+        for completed in asyncio.as_completed(tasks):
+            index, result, error = await completed
+            if error is not None:
+                yield ("section_error", index, str(error))
+                continue
+            for risk in result.risks:
+                findings.append(risk)
+                yield ("finding", index, risk)
+    finally:
+        # Client went away: stop auditing the remaining sections
+        for task in tasks:
+            task.cancel()
+
+    yield ("result", Audit(risks=merge_risks(findings)))
+
+
+# Async variants: these await the model instead of holding a threadpool
+# worker for the whole LLM call, so one worker can serve many requests
+
+async def aextract_from_pdf(pdf_path: str):
+    """Async version of `extract_from_pdf`"""
+
+    # Validate file exists
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+
+    try:
+        pdf_file = await asyncio.to_thread(pdf_to_base64, pdf_path)
+        message = pdf_messages(extract_system_prompt, extract_user_prompt, pdf_file)
+        return await llm_governor.acall(get_extract_model().ainvoke, message, config=llm_config("extract"))
+
+    except Exception as e:
+        raise Exception(f"Error extracting data from PDF: {str(e)}")
+
+async def aextract_field(document_id: str, name: str, k: int = EXTRACT_TOP_K):
+    """Async version of `extract_field`"""
+    citations = await aretrieve_citations(Extract.model_fields[name].description, document_id, k=k)
+    result = await llm_governor.acall(
+        get_model().with_structured_output(field_schema(name)).ainvoke,
+        field_messages(name, citations), config=llm_config("extract_retrieval"),
+    )
+    return getattr(result, name)
+
+async def aextract_by_retrieval(document_id: str, k: int = EXTRACT_TOP_K) -> Extract:
+    """Async version of `extract_by_retrieval`"""
+    try:
+        names = list(Extract.model_fields)
+        values = await asyncio.gather(*(aextract_field(document_id, name, k) for name in names))
+        return Extract(**dict(zip(names, values)))
+
+    except Exception as e:
+        raise Exception(f"Error extracting data from document: {str(e)}")
+
+async def allm_audit(pdf_path: str):
+    """Async version of `llm_audit`"""
+
+    # Validate file exists
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+
+    try:
+        pdf_file = await asyncio.to_thread(pdf_to_base64, pdf_path)
+        message = pdf_messages(audit_system_prompt, audit_user_prompt, pdf_file)
+        return await llm_governor.acall(get_audit_model().ainvoke, message, config=llm_config("audit"))
+
+    except Exception as e:
+        raise Exception(f"Error extracting data from PDF: {str(e)}")
+
+async def aperform_rag(query: str, document_id: str):
+    """Async version of `perform_rag`"""
+
+    with timed("agent"):
+        output = await get_agent().ainvoke(
+            {"messages": [{"role": "user", "content": query}]},
+            config=llm_config("rag", stage="agent_turn"),
+            context=RetrievalContext(document_id=document_id),
+        )
+    final_output = output["messages"][-1].content
+    citations = get_citations(output)
+    return final_output, citations
+
+async def allm_response(query: str, context: dict):
+    """Async version of `llm_response`"""
+    return await llm_governor.acall(get_model().ainvoke, answer_messages(query, context), config=llm_config("answer"),
+                                   default=Priority.INTERACTIVE)
+
+async def allm_response_stream(query: str, context: dict):
+    """Async version of `llm_response_stream`"""
+    async for chunk in llm_governor.astream(get_model().astream, answer_messages(query, context), config=llm_config("answer")):
+        content = chunk_text(chunk)
+        if content:
+            yield content
+
+async def aretrieve_citations(query: str, document_id: str, k: int = 4):
+    """Async version of `retrieve_citations`"""
+    # Chroma is a local, synchronous store: run the search off the event loop
+    return await asyncio.to_thread(retrieve_citations, query, document_id, k)
+
+async def aanswer_stream(query: str, citations: list):
+    """Async version of `answer_stream`"""
+    async for chunk in llm_governor.astream(get_model().astream, query_messages(query, citations), config=llm_config("query")):
+        content = chunk_text(chunk)
+        if content:
+            yield content
@@ -0,0 +1,152 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Dict
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import Counter, Gauge, Histogram
+
+# Buckets in seconds: from sub-millisecond lookups up to long multimodal LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    "contract_stage_seconds",
+    "Latency of pipeline stages (pdf_load, split, embed_batch, vector_search, lexical_search, agent_turn...)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_CALL_SECONDS = Histogram(
+    "contract_llm_call_seconds",
+    "Latency of individual LLM calls",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TTFT_SECONDS = Histogram(
+    "contract_llm_time_to_first_token_seconds",
+    "Time to the first streamed token of an LLM call",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "contract_llm_tokens",
+    "LLM tokens consumed",
+    ["operation", "direction"],
+)
+CACHE_REQUESTS = Counter(
+    "contract_cache_requests",
+    "Cache lookups by cache and outcome",
+    ["cache", "outcome"],
+)
+HTTP_IN_FLIGHT = Gauge(
+    "contract_http_requests_in_flight",
+    "HTTP requests currently being served",
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "contract_http_request_seconds",
+    "HTTP request latency by route, until the last byte of the response is sent",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+@contextmanager
+def timed(stage: str):
+    """Observe the duration of the enclosed block as a pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+def cache_lookup(cache: str, hit: bool, count: int = 1):
+    if count:
+        CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc(count)
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """
+    Callback handler recording latency, time-to-first-token and token usage
+    of every chat model call made under a given operation (endpoint).
+
+    Pass it per call: `runnable.invoke(input, config={"callbacks": [LLMMetricsHandler("extract")]})`.
+    """
+
+    # Record inline instead of hopping to a thread for async runs
+    run_inline = True
+
+    def __init__(self, operation: str, stage: str = ""):
+        self.operation = operation
+        self.stage = stage
+        self._started: Dict[UUID, float] = {}
+        self._first_token: set = set()
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id: UUID, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs):
+        if run_id in self._started and run_id not in self._first_token:
+            self._first_token.add(run_id)
+            LLM_TTFT_SECONDS.labels(self.operation).observe(time.perf_counter() - self._started[run_id])
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        started = self._started.pop(run_id, None)
+        self._first_token.discard(run_id)
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            LLM_CALL_SECONDS.labels(self.operation).observe(elapsed)
+            if self.stage:
+                STAGE_SECONDS.labels(self.stage).observe(elapsed)
+
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    LLM_TOKENS.labels(self.operation, "input").inc(usage.get("input_tokens", 0))
+                    LLM_TOKENS.labels(self.operation, "output").inc(usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._started.pop(run_id, None)
+        self._first_token.discard(run_id)
+
+
+def llm_config(operation: str, stage: str = "") -> dict:
+    """Runnable config attaching an LLMMetricsHandler for `operation`"""
+    return {"callbacks": [LLMMetricsHandler(operation, stage)]}
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware tracking in-flight requests and per-route latency.
+
+    Pure ASGI (not `BaseHTTPMiddleware`) so a streaming response counts as in
+    flight until its last chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # Label by route template ("/jobs/{job_id}"), not the raw path
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status["code"])).observe(
+                time.perf_counter() - start
+            )
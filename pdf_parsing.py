@@ -0,0 +1,63 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+# Configuration
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_TASK = 16  # pages extracted by one worker task
+PARALLEL_MIN_PAGES = 32  # smaller documents are parsed in-process
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned workers only import this module, not the API and its clients
+            _pool = ProcessPoolExecutor(
+                max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def extract_pages(file_path: str, start: int, stop: int) -> List[Tuple[int, str, str]]:
+    """Extract (page number, text, page label) for pages [start, stop) of a PDF"""
+    reader = PdfReader(file_path)
+    labels = reader.page_labels
+    return [(i, reader.pages[i].extract_text(), labels[i]) for i in range(start, stop)]
+
+
+def iter_pages(file_path: str) -> Iterator[Document]:
+    """
+    Yield one Document per PDF page, in page order, with the same metadata
+    keys as PyPDFLoader.
+
+    Large documents are split into page ranges that are extracted in parallel
+    by a process pool; pages are yielded as soon as their range is done, so
+    the caller can split and embed while later pages are still being parsed.
+    """
+    total_pages = len(PdfReader(file_path).pages)
+
+    if total_pages < PARALLEL_MIN_PAGES or PARSE_WORKERS <= 1:
+        ranges = [extract_pages(file_path, 0, total_pages)]
+    else:
+        pool = _get_pool()
+        futures = [
+            pool.submit(extract_pages, file_path, start, min(start + PAGES_PER_TASK, total_pages))
+            for start in range(0, total_pages, PAGES_PER_TASK)
+        ]
+        ranges = (future.result() for future in futures)
+
+    for pages in ranges:
+        for page, text, label in pages:
+            yield Document(
+                page_content=text,
+                metadata={"source": file_path, "total_pages": total_pages, "page": page, "page_label": label},
+            )
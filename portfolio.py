@@ -0,0 +1,171 @@
+"""
+Search across every ingested contract at once.
+
+Chunks of all documents are kept in one HNSW collection next to the
+per-document partitions (see rag.get_portfolio_collection), so a portfolio
+query is a single approximate nearest-neighbour search whatever the number
+of contracts: the hits are grouped by document, documents are ranked by
+their best hit and pages of documents are cut from that ranking. Catalog
+filters (name, counterparty, governing law, ingestion date) are resolved in
+SQLite first and restrict the vector search to the matching documents.
+
+Documents ingested before the portfolio collection existed are added on
+their next re-ingestion, or all at once with:
+
+    python portfolio.py --backfill
+
+The collection is a float copy of every stored vector, next to the
+partitions. It is only maintained with PORTFOLIO_INDEX (see rag.py), off by
+default when VECTOR_STORE_MODE=int8 since it would cancel the memory saved.
+"""
+import argparse
+import logging
+import os
+import sys
+from typing import List, Optional
+
+import catalog
+import rag
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PORTFOLIO_OVERFETCH = int(os.environ.get("PORTFOLIO_OVERFETCH", "4"))  # chunks fetched per hit returned
+PORTFOLIO_MAX_CANDIDATES = int(os.environ.get("PORTFOLIO_MAX_CANDIDATES", "2000"))  # cap on chunks fetched per query
+PORTFOLIO_FILTER_BATCH = 500  # document ids per `$in` filter; larger filtered sets are searched batch by batch
+
+# Shown with every document, from its last extraction
+SUMMARY_FIELDS = ["parties", "effective_date", "governing_law", "term"]
+
+
+def group_hits(ids: List[str], distances: List[float], texts: List[str], metadatas: List[dict], k: int) -> List[dict]:
+    """
+    Group chunk hits (best first) by document: documents are ordered by their
+    best hit and keep at most `k` hits each.
+    """
+    groups = {}
+    for chunk, distance, text, metadata in zip(ids, distances, texts, metadatas):
+        document_id = metadata["document_id"]
+        group = groups.setdefault(document_id, {"document_id": document_id, "hits": []})
+        if len(group["hits"]) < k:
+            group["hits"].append({
+                "chunk_id": metadata.get("chunk_id"),
+                # Squared L2 distance between unit vectors -> cosine similarity
+                "score": round(1 - distance / 2, 4),
+                "page": metadata["page"] + 1 if metadata.get("page") is not None else None,
+                "content": text,
+            })
+    ranked = list(groups.values())
+    for group in ranked:
+        group["score"] = group["hits"][0]["score"]
+    return ranked
+
+
+def search(query: str, k: int = 3, limit: int = 10, offset: int = 0, name: Optional[str] = None,
+           counterparty: Optional[str] = None, governing_law: Optional[str] = None,
+           ingested_after: Optional[float] = None, ingested_before: Optional[float] = None) -> dict:
+    """
+    Similarity search across the portfolio, grouped per document.
+
+    Args:
+        query: Text to search for
+        k: Hits returned per document
+        limit: Documents per page
+        offset: Documents skipped, for pagination
+        name, counterparty, governing_law, ingested_after, ingested_before:
+            Catalog filters, see catalog.find_documents
+
+    Returns:
+        dict: The page of documents (best first, each with its top-k hits and
+            catalog summary), the offset of the next page if any, and
+            `truncated` when the PORTFOLIO_MAX_CANDIDATES cap may have hidden
+            documents from this page on
+    """
+    filtered = any(value is not None for value in (name, counterparty, governing_law, ingested_after, ingested_before))
+    filters = [None]
+    if filtered:
+        document_ids = catalog.find_documents(
+            name=name, counterparty=counterparty, governing_law=governing_law,
+            ingested_after=ingested_after, ingested_before=ingested_before,
+        )
+        if not document_ids:
+            return {"query": query, "offset": offset, "limit": limit, "k": k, "results": [],
+                    "next_offset": None, "truncated": False}
+        batches = [document_ids[i:i + PORTFOLIO_FILTER_BATCH] for i in range(0, len(document_ids), PORTFOLIO_FILTER_BATCH)]
+        filters = [{"document_id": {"$in": batch}} if len(batch) > 1 else {"document_id": batch[0]} for batch in batches]
+
+    # Enough chunks for one more document than the page needs, to know whether
+    # another page exists. Deep pages are bounded by PORTFOLIO_MAX_CANDIDATES
+    wanted = (offset + limit + 1) * k * PORTFOLIO_OVERFETCH
+    candidates = min(wanted, PORTFOLIO_MAX_CANDIDATES)
+    collection = rag.get_portfolio_collection()
+    vector = rag.get_index_embeddings().embed_query(query)
+    hits = []
+    capped = False
+    with timed("portfolio_search"):
+        for where in filters:
+            found = collection.query(
+                query_embeddings=[vector],
+                n_results=candidates,
+                where=where,
+                include=["documents", "metadatas", "distances"],
+            )
+            capped = capped or (wanted > candidates and len(found["ids"][0]) == candidates)
+            hits.extend(zip(found["ids"][0], found["distances"][0], found["documents"][0], found["metadatas"][0]))
+    # Batches are merged back into one ranking
+    hits.sort(key=lambda hit: hit[1])
+    hits = hits[:candidates]
+    groups = group_hits([h[0] for h in hits], [h[1] for h in hits], [h[2] for h in hits], [h[3] for h in hits], k)
+
+    page = groups[offset:offset + limit]
+    documents = catalog.get_documents([group["document_id"] for group in page])
+    for group in page:
+        document = documents.get(group["document_id"]) or {}
+        fields = document.get("fields") or {}
+        group["name"] = document.get("name")
+        group["pages"] = document.get("pages")
+        group["ingested_at"] = document.get("ingested_at")
+        group["fields"] = {field: fields.get(field) for field in SUMMARY_FIELDS} if fields else None
+
+    has_more = len(groups) > offset + limit
+    # Not enough distinct documents within the cap: results past it are unknown
+    truncated = capped and not has_more
+    return {
+        "query": query,
+        "offset": offset,
+        "limit": limit,
+        "k": k,
+        "results": page,
+        "next_offset": offset + limit if has_more else None,
+        "truncated": truncated,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the cross-document portfolio collection")
+    parser.add_argument("--backfill", action="store_true",
+                        help="copy the stored vectors of every ingested document into the portfolio collection")
+    args = parser.parse_args(argv)
+    if not args.backfill:
+        parser.print_help()
+        return 0
+
+    logging.basicConfig(level=logging.INFO)
+    if not rag.PORTFOLIO_INDEX:
+        logger.error("PORTFOLIO_INDEX is off: the portfolio collection would not be kept up to date")
+        return 1
+    document_ids = catalog.find_documents()
+    chunks = failed = 0
+    for document_id in document_ids:
+        try:
+            chunks += rag.backfill_portfolio(document_id)
+        except Exception as e:
+            failed += 1
+            logger.error(f"Backfill failed for {document_id}: {str(e)}")
+    logger.info(f"Portfolio backfilled with {chunks} chunks from {len(document_ids) - failed} documents")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,4 +12,33 @@ You have to answer their queries using the below provided context, the context i
 retrieval step and it contains the agents final output and gathered citations from the user's document: \n\n 
 - Agent Output: \n{agent_output}\n\n
 - Citations: \n
-{citations}"""
\ No newline at end of file
+{citations}"""
+
+extract_system_prompt = "Act as a legal contract expert and help extract useful information from the document. Extract all relevant contract details accurately."
+
+extract_user_prompt = "Extract all structured information from this contract document including parties, dates, terms, and all other relevant details."
+
+audit_system_prompt = "Act as a legal contract expert. Analyse the uploaded contract thoroughly and help find out any risky clauses in the contract."
+
+audit_user_prompt = "Analyse the document and find out any risky clauses present in the contract"
+
+query_prompt = """You are a legal contract expert and are helping people with their queries regarding their contracts.
+Answer the user's query using only the below citations, which were retrieved from the user's contract.
+If the citations do not contain the answer, say so instead of guessing: \n\n
+- Citations: \n
+{citations}"""
+
+extract_field_system_prompt = """Act as a legal contract expert and help extract one detail from a contract.
+Use only the below excerpts, which were retrieved from the contract as the most relevant to this detail.
+If the excerpts do not contain it, answer "Not found" instead of guessing: \n\n
+- Excerpts: \n
+{citations}"""
+
+extract_field_user_prompt = "Extract the {field} of this contract: {description}"
+
+audit_section_system_prompt = """Act as a legal contract expert. Below is one section of a longer contract, the other sections are reviewed separately.
+Find any risky clauses in this section only, quoting the evidence exactly as it appears. Return no risks if there are none: \n\n
+- Section (pages {pages}): \n
+{section}"""
+
+audit_section_user_prompt = "Analyse this section and find out any risky clauses present in it"
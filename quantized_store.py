@@ -0,0 +1,167 @@
+import os
+import json
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+
+def truncate(vectors, dimensions: int) -> np.ndarray:
+    """
+    Keep the first `dimensions` components and re-normalize: gemini-embedding-001
+    is trained so that prefixes of its vectors are embeddings themselves.
+    """
+    array = np.asarray(vectors, dtype=np.float32)
+    if dimensions:
+        array = array[..., :dimensions]
+    norms = np.linalg.norm(array, axis=-1, keepdims=True)
+    return array / np.where(norms == 0, 1, norms)
+
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector int8 quantization: returns (codes, scales), vector ~= codes * scale"""
+    scales = np.abs(vectors).max(axis=-1) / 127.0
+    scales = np.where(scales == 0, 1, scales).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+class ReducedEmbeddings(Embeddings):
+    """Embeddings wrapper truncating vectors to `dimensions` (see `truncate`)"""
+
+    def __init__(self, underlying: Embeddings, dimensions: int):
+        self.underlying = underlying
+        self.dimensions = dimensions
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return truncate(self.underlying.embed_documents(texts), self.dimensions).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return truncate(self.underlying.embed_query(text), self.dimensions).tolist()
+
+
+class Int8VectorStore:
+    """
+    One document's chunks with int8 scalar-quantized vectors, searched by
+    exact (brute-force) inner product against the float query.
+
+    A quarter of the memory of float32 vectors, and no HNSW graph: partitions
+    hold one contract, small enough that a full scan is faster than a graph
+    walk. Persisted as one .npz file, rewritten atomically on every change.
+    Implements the subset of the Chroma store interface used by rag.py.
+    """
+
+    def __init__(self, path: Path, embedding_function: Optional[Embeddings] = None):
+        self.path = Path(path)
+        self.embedding_function = embedding_function
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._codes = np.zeros((0, 0), dtype=np.int8)
+        self._scales = np.zeros(0, dtype=np.float32)
+        if self.path.exists():
+            with np.load(self.path, allow_pickle=False) as data:
+                self._codes, self._scales = data["codes"], data["scales"]
+                payload = json.loads(str(data["payload"]))
+            self._ids, self._texts, self._metadatas = payload["ids"], payload["texts"], payload["metadatas"]
+
+    def _persist(self):
+        # Called with the lock held
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = json.dumps({"ids": self._ids, "texts": self._texts, "metadatas": self._metadatas})
+        tmp = self.path.with_suffix(".tmp.npz")
+        np.savez(tmp, codes=self._codes, scales=self._scales, payload=np.array(payload))
+        os.replace(tmp, self.path)
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the vectors"""
+        return self._codes.nbytes + self._scales.nbytes
+
+    def get(self, include=None) -> dict:
+        return {"ids": list(self._ids)}
+
+    def items(self) -> dict:
+        """Everything stored, shaped like a Chroma `get`; vectors are de-quantized"""
+        with self._lock:
+            return {
+                "ids": list(self._ids),
+                "embeddings": self._codes.astype(np.float32) * self._scales[:, None],
+                "documents": list(self._texts),
+                "metadatas": list(self._metadatas),
+            }
+
+    def add_vectors(self, ids: List[str], vectors, texts: List[str], metadatas: List[dict]):
+        """Store already embedded (and normalized) vectors"""
+        codes, scales = quantize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            self._codes = codes if not self._ids else np.concatenate([self._codes, codes])
+            self._scales = np.concatenate([self._scales, scales])
+            # New lists rather than in-place changes, so snapshots stay consistent
+            self._ids = self._ids + list(ids)
+            self._texts = self._texts + list(texts)
+            self._metadatas = self._metadatas + list(metadatas)
+            self._persist()
+
+    def add_documents(self, documents: List[Document], ids: List[str]) -> List[str]:
+        vectors = self.embedding_function.embed_documents([doc.page_content for doc in documents])
+        self.add_vectors(ids, vectors, [doc.page_content for doc in documents], [doc.metadata for doc in documents])
+        return ids
+
+    def update_metadata(self, ids: List[str], metadatas: List[dict]):
+        with self._lock:
+            positions = {chunk_id: i for i, chunk_id in enumerate(self._ids)}
+            updated = list(self._metadatas)
+            for chunk_id, metadata in zip(ids, metadatas):
+                if chunk_id in positions:
+                    updated[positions[chunk_id]] = metadata
+            self._metadatas = updated
+            self._persist()
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            remove = set(ids)
+            keep = [i for i, chunk_id in enumerate(self._ids) if chunk_id not in remove]
+            self._codes, self._scales = self._codes[keep], self._scales[keep]
+            self._ids = [self._ids[i] for i in keep]
+            self._texts = [self._texts[i] for i in keep]
+            self._metadatas = [self._metadatas[i] for i in keep]
+            self._persist()
+
+    def _snapshot(self) -> Tuple[np.ndarray, np.ndarray, List[str], List[str], List[dict]]:
+        # delete() and add_vectors() replace these together: read them together
+        with self._lock:
+            return self._codes, self._scales, self._ids, self._texts, self._metadatas
+
+    @staticmethod
+    def _top_k(codes: np.ndarray, scales: np.ndarray, vector, k: int) -> List[Tuple[int, float]]:
+        if not len(scales):
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        scores = (codes @ query) * scales
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(i), float(scores[i])) for i in best]
+
+    def search_by_vector(self, vector, k: int) -> List[Tuple[int, float]]:
+        """(position, cosine similarity) of the k best chunks"""
+        codes, scales, _, _, _ = self._snapshot()
+        return self._top_k(codes, scales, vector, k)
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        vector = self.embedding_function.embed_query(query)
+        codes, scales, ids, texts, metadatas = self._snapshot()
+        return [
+            Document(id=ids[i], page_content=texts[i], metadata=metadatas[i])
+            for i, _ in self._top_k(codes, scales, vector, k)
+        ]
@@ -0,0 +1,116 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Configuration
+QUERY_CACHE_THRESHOLD = float(os.environ.get("QUERY_CACHE_THRESHOLD", "0.95"))  # min cosine similarity for a hit
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", "3600"))  # seconds
+QUERY_CACHE_MAX_ENTRIES = int(os.environ.get("QUERY_CACHE_MAX_ENTRIES", "256"))  # per document
+QUERY_CACHE_MAX_DOCUMENTS = int(os.environ.get("QUERY_CACHE_MAX_DOCUMENTS", "1000"))
+
+
+class _DocumentEntries:
+    """Cached answers of one document version, with their normalized query vectors"""
+
+    def __init__(self, content_hash: str):
+        self.content_hash = content_hash
+        self.entries: "OrderedDict[int, dict]" = OrderedDict()
+        self.next_id = 0
+        self.ids: List[int] = []
+        self.matrix: Optional[np.ndarray] = None
+
+    def rebuild(self):
+        self.ids = list(self.entries)
+        self.matrix = np.stack([self.entries[i]["vector"] for i in self.ids]) if self.ids else None
+
+
+class SemanticQueryCache:
+    """
+    Per-document cache of RAG answers keyed by query embedding.
+
+    A new query hits when its cosine similarity to a cached query of the same
+    document version reaches the threshold. Entries expire after a TTL and the
+    least recently used ones are evicted per document and across documents.
+    """
+
+    def __init__(self, threshold: float = QUERY_CACHE_THRESHOLD, ttl: float = QUERY_CACHE_TTL,
+                 max_entries: int = QUERY_CACHE_MAX_ENTRIES, max_documents: int = QUERY_CACHE_MAX_DOCUMENTS):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_documents = max_documents
+        self._documents: "OrderedDict[str, _DocumentEntries]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _expire(self, document: _DocumentEntries):
+        # Called with the lock held
+        cutoff = time.time() - self.ttl
+        expired = [i for i, entry in document.entries.items() if entry["created_at"] < cutoff]
+        for i in expired:
+            del document.entries[i]
+        if expired:
+            document.rebuild()
+
+    def lookup(self, document_id: str, content_hash: str, vector) -> Optional[Tuple[str, list]]:
+        """Return the cached (output, citations) for a close enough query, or None"""
+        query = self._normalize(vector)
+        with self._lock:
+            document = self._documents.get(document_id)
+            if document is None or document.content_hash != content_hash:
+                return None
+            self._documents.move_to_end(document_id)
+
+            self._expire(document)
+            if document.matrix is None:
+                return None
+
+            similarities = document.matrix @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            entry_id = document.ids[best]
+            document.entries.move_to_end(entry_id)
+            entry = document.entries[entry_id]
+            return entry["output"], entry["citations"]
+
+    def store(self, document_id: str, content_hash: str, vector, output: str, citations: list):
+        """Cache the answer to a query"""
+        with self._lock:
+            document = self._documents.get(document_id)
+            if document is None or document.content_hash != content_hash:
+                document = _DocumentEntries(content_hash)
+                self._documents[document_id] = document
+            self._documents.move_to_end(document_id)
+
+            document.entries[document.next_id] = {
+                "vector": self._normalize(vector),
+                "output": output,
+                "citations": citations,
+                "created_at": time.time(),
+            }
+            document.next_id += 1
+            while len(document.entries) > self.max_entries:
+                document.entries.popitem(last=False)
+            document.rebuild()
+
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+
+    def invalidate(self, document_id: str):
+        """Forget every cached answer of a document, e.g. when it is re-ingested"""
+        with self._lock:
+            self._documents.pop(document_id, None)
+
+
+query_cache = SemanticQueryCache()
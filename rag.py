@@ -1,37 +1,227 @@
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_chroma import Chroma
-from langchain.tools import tool
-import getpass
-import os
+from langchain.tools import tool, ToolRuntime
+from embedding_cache import CachedEmbeddings
+from governor import GovernedEmbeddings
+from quantized_store import Int8VectorStore, ReducedEmbeddings
+from pdf_parsing import iter_pages
+from clause_splitter import ClauseSplitter
+from chromadb.errors import NotFoundError
+import chromadb
+import hashlib
 import json
+import os
+import time
+import threading
+from dataclasses import dataclass
+from typing import Optional
+import catalog
+import lexical
+from lazy import lazy
+from metrics import timed, STAGE_SECONDS
 from dotenv import load_dotenv
 from pathlib import Path
 load_dotenv()
 
-if not os.environ.get("GOOGLE_API_KEY"):
-    os.environ["GOOGLE_API_KEY"] = getpass.getpass("Enter API key for Google Gemini: ")
+EMBED_BATCH_SIZE = 64  # chunks embedded per add_documents call
+HYBRID_CANDIDATES = 8  # hits taken from each of the vector and keyword rankings before fusion
+RRF_K = 60  # reciprocal rank fusion damping constant
+SPLITTER_MODE = os.environ.get("SPLITTER_MODE", "recursive")  # "recursive" or "clause"
+EMBEDDING_DIMENSIONS = int(os.environ.get("EMBEDDING_DIMENSIONS", "0"))  # stored vector width, 0 keeps all 3072
+VECTOR_STORE_MODE = os.environ.get("VECTOR_STORE_MODE", "float")  # "float" (Chroma) or "int8" (quantized)
+# The portfolio collection is a second, float copy of every vector: off by
+# default with int8 partitions, whose point is saving memory
+PORTFOLIO_INDEX = os.environ.get(
+    "PORTFOLIO_INDEX", "false" if VECTOR_STORE_MODE == "int8" else "true"
+).lower() in ("1", "true", "yes")
+
+EMBEDDING_MODEL = "models/gemini-embedding-001"
+PERSIST_DIR = Path("./chroma_langchain_db")
+
+
+def require_api_key():
+    # Fail fast instead of prompting: there is no terminal inside a container
+    if not os.environ.get("GOOGLE_API_KEY"):
+        raise RuntimeError("GOOGLE_API_KEY is not set. Add it to your environment or .env file.")
+
+
+# Clients are created on first use, so importing this module stays fast
+
+@lazy("embeddings")
+def get_embeddings() -> CachedEmbeddings:
+    """
+    Gemini embeddings behind the on-disk cache, keyed by chunk text hash;
+    cache misses are scheduled by the embedding governor
+    """
+    require_api_key()
+    PERSIST_DIR.mkdir(exist_ok=True)
+    return CachedEmbeddings(
+        GovernedEmbeddings(GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)),
+        cache_path=str(PERSIST_DIR / "embedding_cache.sqlite"),
+        namespace=EMBEDDING_MODEL,
+    )
+
+
+def get_index_embeddings(dimensions: int = EMBEDDING_DIMENSIONS):
+    """
+    Embeddings as stored in the document partitions: the cache keeps the full
+    vectors, so changing EMBEDDING_DIMENSIONS never calls the API again
+    """
+    embeddings = get_embeddings()
+    return ReducedEmbeddings(embeddings, dimensions) if dimensions else embeddings
 
-embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
 
-vector_store = Chroma(
+@lazy("chroma_client")
+def get_chroma_client():
+    PERSIST_DIR.mkdir(exist_ok=True)
+    return chromadb.PersistentClient(path=str(PERSIST_DIR))
+
+
+@lazy("legacy_store")
+def get_legacy_store() -> Chroma:
+    """
+    Shared collection used before documents got their own partitions; only
+    searched for catalogued documents that were never re-ingested
+    """
+    return Chroma(
         collection_name="my_collection",
-        embedding_function=embeddings,
-        persist_directory="./chroma_langchain_db",  # Where to save data locally, remove if not necessary
+        embedding_function=get_embeddings(),
+        client=get_chroma_client(),
     )
 
 
-def pdf_loader(file_path: str):
+# Each document lives in its own collection, so a search only scans one contract
+_document_stores: dict[str, Chroma | Int8VectorStore] = {}
+_document_stores_lock = threading.Lock()
+
+
+def collection_name(document_id: str, dimensions: int = EMBEDDING_DIMENSIONS, mode: str = VECTOR_STORE_MODE) -> str:
+    """
+    Partition name for a storage layout. Full-width float partitions keep the
+    original `doc_<id>` name; other layouts get a suffix, so a re-index
+    (reindex.py) builds them next to the existing ones.
+    """
+    suffix = f"_d{dimensions}" if dimensions else ""
+    if mode == "int8":
+        suffix += "_int8"
+    return f"doc_{document_id}{suffix}"
+
+
+def int8_store_path(name: str) -> Path:
+    return PERSIST_DIR / "int8" / f"{name}.npz"
+
+
+# Vector widths partitions may exist at, besides the configured one: the full
+# width and every width reindex.py has built (recorded in layouts.json)
+LAYOUTS_FILE = PERSIST_DIR / "layouts.json"
+
+
+def _recorded_dimensions() -> list:
+    return json.loads(LAYOUTS_FILE.read_text())["dimensions"] if LAYOUTS_FILE.exists() else []
+
+
+def known_dimensions() -> list:
+    return sorted({0, EMBEDDING_DIMENSIONS, *_recorded_dimensions()})
+
+
+def record_dimensions(dimensions: int):
+    """Remember that partitions were built at `dimensions`, so deletions find them"""
+    recorded = _recorded_dimensions()
+    if dimensions not in recorded:
+        PERSIST_DIR.mkdir(exist_ok=True)
+        LAYOUTS_FILE.write_text(json.dumps({"dimensions": sorted({*recorded, dimensions})}))
+
+
+def layout_names(document_id: str) -> list:
+    """Every partition name a document may have, in any storage layout"""
+    return [collection_name(document_id, dimensions, mode)
+            for dimensions in known_dimensions() for mode in ("float", "int8")]
 
-    loader = PyPDFLoader(Path(file_path))
 
-    docs = loader.load()
+def get_existing_collection(name: str):
+    """The Chroma collection `name`, or None if there is none (without listing every collection)"""
+    try:
+        return get_chroma_client().get_collection(name)
+    except NotFoundError:
+        return None
 
-    return docs
 
-# print(len(docs))
-# print(f"{docs[0].page_content[:200]}\n")
+def get_vector_store(document_id: str) -> Chroma | Int8VectorStore:
+    """Return the vector store partition holding a single document's chunks"""
+    with _document_stores_lock:
+        store = _document_stores.get(document_id)
+        if store is None:
+            name = collection_name(document_id)
+            if VECTOR_STORE_MODE == "int8":
+                store = Int8VectorStore(int8_store_path(name), embedding_function=get_index_embeddings())
+            else:
+                store = Chroma(
+                    collection_name=name,
+                    embedding_function=get_index_embeddings(),
+                    client=get_chroma_client(),
+                )
+            _document_stores[document_id] = store
+        return store
+
+
+def portfolio_collection_name(dimensions: int = EMBEDDING_DIMENSIONS) -> str:
+    return f"portfolio_d{dimensions}" if dimensions else "portfolio"
+
+
+@lazy("portfolio_collection")
+def get_portfolio_collection():
+    """
+    Every document's chunks in one HNSW collection, tagged with their
+    document id, for searches across contracts (see portfolio.py). Float
+    vectors whatever VECTOR_STORE_MODE: a scan would not scale to the corpus.
+    Only kept up to date with PORTFOLIO_INDEX.
+    """
+    return get_chroma_client().get_or_create_collection(portfolio_collection_name())
+
+
+def portfolio_id(document_id: str, chunk_id: str) -> str:
+    return f"{document_id}:{chunk_id}"
+
+
+def add_embedded(store: Chroma | Int8VectorStore, ids: list, vectors: list, chunks: list):
+    """Write chunks whose vectors are already computed to a document partition"""
+    texts = [chunk.page_content for chunk in chunks]
+    metadatas = [chunk.metadata for chunk in chunks]
+    if isinstance(store, Int8VectorStore):
+        store.add_vectors(ids, vectors, texts, metadatas)
+    else:
+        store._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+
+
+def partition_contents(document_id: str) -> dict:
+    """Ids, vectors, texts and metadata stored in a document's partition (no embedding client needed)"""
+    name = collection_name(document_id)
+    if VECTOR_STORE_MODE == "int8":
+        return Int8VectorStore(int8_store_path(name)).items()
+    collection = get_existing_collection(name)
+    if collection is None:
+        return {"ids": []}
+    return collection.get(include=["embeddings", "documents", "metadatas"])
+
+
+def backfill_portfolio(document_id: str) -> int:
+    """Copy a document's stored vectors into the portfolio collection; returns the chunks copied"""
+    contents = partition_contents(document_id)
+    ids = contents["ids"]
+    if not ids:
+        return 0
+    portfolio = get_portfolio_collection()
+    for start in range(0, len(ids), EMBED_BATCH_SIZE):
+        end = start + EMBED_BATCH_SIZE
+        portfolio.upsert(
+            ids=[portfolio_id(document_id, chunk_id) for chunk_id in ids[start:end]],
+            embeddings=contents["embeddings"][start:end].tolist(),
+            documents=contents["documents"][start:end],
+            metadatas=contents["metadatas"][start:end],
+        )
+    return len(ids)
+
 
 def split_document(docs):
     text_splitter = RecursiveCharacterTextSplitter(
@@ -76,34 +266,275 @@ def split_document(docs):
 #     return results[0].page_content
 
 
-def create_vector_store(file_path: str):
-    
-    docs = pdf_loader(file_path=file_path)
-    doc_splits = split_document(docs=docs)
-
-    ids = vector_store.add_documents(documents=doc_splits)
-
-    return ids
-
-
-# pdf_files = list(Path("docs").glob("*.pdf"))
-# # latest uploaded pdf file
-# if pdf_files:
-#     file_path = str(max(pdf_files, key=os.path.getctime))    
-if os.path.exists("docs/uploaded_files.json"):
-    with open("docs/uploaded_files.json", "r") as f:
-        data = json.load(f)
-        file_path = data.get("current_file", "")
-
-else:
-    file_path = ""
+def chunk_id(text: str, seen: dict) -> str:
+    """
+    Content-derived chunk id: the hash of the chunk text, suffixed with an
+    occurrence counter (tracked in `seen`) when the same text repeats.
+    """
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+    occurrence = seen.get(digest, 0)
+    seen[digest] = occurrence + 1
+    return digest if occurrence == 0 else f"{digest}-{occurrence}"
+
+
+def create_vector_store(file_path: str, document_id: str, progress=None, incremental: bool = True,
+                        splitter: str = SPLITTER_MODE, source: Optional[str] = None):
+    """
+    Load, split and embed a PDF into its document's vector store partition.
+
+    Args:
+        file_path: Path to the PDF file to ingest
+        document_id: Catalog id of the document, selects the partition
+        progress: Optional callback `progress(stage, **info)` used to report
+            parse/split/embed progress to the caller
+        incremental: Diff against the chunks already stored for the document:
+            only new chunks are embedded and chunks that disappeared are
+            deleted. Otherwise the partition is rebuilt from scratch.
+        splitter: "recursive" for fixed-size 1000/200 chunks, or "clause" for
+            one chunk per detected contract clause (see clause_splitter.py)
+        source: Path recorded as the chunks' `source`, when `file_path` is a
+            temporary snapshot of the document (defaults to `file_path`)
+
+    Returns:
+        dict: Ids of the stored chunks, page/chunk counts and how many chunks
+            were added, kept and removed
+    """
+    report = progress or (lambda stage, **info: None)
+
+    if not incremental:
+        delete_vectors(document_id)
+    store = get_vector_store(document_id)
+    portfolio = get_portfolio_collection() if PORTFOLIO_INDEX else None
+    existing = set(store.get(include=[])["ids"])
+
+    # Pages are split as they come out of the parser, and chunks are embedded
+    # as soon as a full batch is ready, so the three stages overlap
+    pages = 0
+    doc_splits = []
+    pending = []
+    kept = []
+    seen = {}
+    added = 0
+
+    def embed(batch):
+        nonlocal added
+        ids = [chunk.metadata["chunk_id"] for chunk in batch]
+        with timed("embed_batch"):
+            # Embedded once, written to the document's partition and the portfolio
+            vectors = get_index_embeddings().embed_documents([chunk.page_content for chunk in batch])
+            add_embedded(store, ids, vectors, batch)
+            if portfolio is not None:
+                portfolio.upsert(
+                    ids=[portfolio_id(document_id, chunk_id) for chunk_id in ids],
+                    embeddings=vectors,
+                    documents=[chunk.page_content for chunk in batch],
+                    metadatas=[chunk.metadata for chunk in batch],
+                )
+        added += len(batch)
+        if parsed:
+            report("embed", embedded=added, total=added + len(pending))
+        else:
+            # Chunks still to come are unknown until parsing ends: pages are
+            # the progress denominator meanwhile
+            report("embed", embedded=added, pages=pages, total_pages=total_pages)
+
+    def add_splits(splits):
+        nonlocal pending
+        for split in splits:
+            split.metadata["document_id"] = document_id
+            split.metadata["chunk_id"] = chunk_id(split.page_content, seen)
+            if split.metadata["chunk_id"] in existing:
+                kept.append(split)
+            else:
+                pending.append(split)
+        doc_splits.extend(splits)
+        report("split", chunks=len(doc_splits))
+
+        while len(pending) >= EMBED_BATCH_SIZE:
+            batch = pending[:EMBED_BATCH_SIZE]
+            pending = pending[EMBED_BATCH_SIZE:]
+            embed(batch)
+
+    clause_splitter = ClauseSplitter() if splitter == "clause" else None
+
+    # Parsing and splitting are interleaved: accumulate each stage's time and
+    # observe one total per document
+    parsed = False
+    total_pages = None
+    parse_seconds = split_seconds = 0.0
+    report("parse")
+    page_iter = iter_pages(file_path)
+    while True:
+        start = time.perf_counter()
+        page = next(page_iter, None)
+        parse_seconds += time.perf_counter() - start
+        if page is None:
+            break
+        pages += 1
+        total_pages = page.metadata["total_pages"]
+        if source:
+            page.metadata["source"] = source
+        report("parse", pages=pages, total=total_pages)
+        start = time.perf_counter()
+        splits = clause_splitter.feed(page) if clause_splitter else split_document(docs=[page])
+        split_seconds += time.perf_counter() - start
+        add_splits(splits)
+    if clause_splitter:
+        start = time.perf_counter()
+        splits = clause_splitter.flush()
+        split_seconds += time.perf_counter() - start
+        add_splits(splits)
+    STAGE_SECONDS.labels("pdf_load").observe(parse_seconds)
+    STAGE_SECONDS.labels("split").observe(split_seconds)
+    parsed = True
+    if pending:
+        batch, pending = pending, []
+        embed(batch)
+    else:
+        report("embed", embedded=added, total=added)
+
+    ids = [chunk.metadata["chunk_id"] for chunk in doc_splits]
+
+    # Unchanged chunks may have moved to another page or offset
+    for start in range(0, len(kept), EMBED_BATCH_SIZE):
+        batch = kept[start:start + EMBED_BATCH_SIZE]
+        update = store.update_metadata if isinstance(store, Int8VectorStore) else store._collection.update
+        update(
+            ids=[chunk.metadata["chunk_id"] for chunk in batch],
+            metadatas=[chunk.metadata for chunk in batch],
+        )
+        if portfolio is None:
+            continue
+        # Documents ingested before the portfolio existed are added to it
+        # here, from the embedding cache
+        pids = [portfolio_id(document_id, chunk.metadata["chunk_id"]) for chunk in batch]
+        present = set(portfolio.get(ids=pids, include=[])["ids"])
+        if present:
+            portfolio.update(
+                ids=[pid for pid in pids if pid in present],
+                metadatas=[chunk.metadata for chunk, pid in zip(batch, pids) if pid in present],
+            )
+        missing = [chunk for chunk, pid in zip(batch, pids) if pid not in present]
+        if missing:
+            portfolio.upsert(
+                ids=[portfolio_id(document_id, chunk.metadata["chunk_id"]) for chunk in missing],
+                embeddings=get_index_embeddings().embed_documents([chunk.page_content for chunk in missing]),
+                documents=[chunk.page_content for chunk in missing],
+                metadatas=[chunk.metadata for chunk in missing],
+            )
+
+    stale = list(existing - set(ids))
+    if stale:
+        store.delete(ids=stale)
+        if portfolio is not None:
+            portfolio.delete(ids=[portfolio_id(document_id, chunk_id) for chunk_id in stale])
+
+    # Keyword index next to the vectors, for exact terms embeddings miss
+    lexical.build_index(document_id, doc_splits)
+
+    return {
+        "ids": ids,
+        "pages": pages,
+        "chunks": len(doc_splits),
+        "added": added,
+        "kept": len(kept),
+        "removed": len(stale),
+    }
+
+
+def delete_vectors(document_id: str, file_path: Optional[str] = None):
+    """
+    Remove every stored chunk of a document: its partitions in every storage
+    layout and the portfolio, plus any chunks of `file_path` left in the legacy
+    shared collection.
+    Returns the number of chunks removed from the current layout.
+    """
+    removed = 0
+    lexical.delete_index(document_id)
+    current = collection_name(document_id)
+    # The lock only guards the cache: Chroma and file I/O run outside it, so
+    # other documents' searches are never held up by a deletion
+    with _document_stores_lock:
+        _document_stores.pop(document_id, None)
+
+    client = get_chroma_client()
+    for name in layout_names(document_id):
+        path = int8_store_path(name)
+        if name.endswith("_int8"):
+            if path.exists() and name == current:
+                removed += Int8VectorStore(path).count()
+            path.unlink(missing_ok=True)
+            continue
+        if name == current:
+            collection = get_existing_collection(name)
+            removed += collection.count() if collection is not None else 0
+        try:
+            client.delete_collection(name)
+        except NotFoundError:
+            pass
+    for dimensions in known_dimensions():
+        portfolio = get_existing_collection(portfolio_collection_name(dimensions))
+        if portfolio is not None:
+            portfolio.delete(where={"document_id": document_id})
+
+    # A search may have opened the partition again meanwhile
+    with _document_stores_lock:
+        _document_stores.pop(document_id, None)
+
+    if file_path:
+        ids = get_legacy_store().get(where={"source": file_path}, include=[])["ids"]
+        if ids:
+            get_legacy_store().delete(ids=ids)
+        removed += len(ids)
+    return removed
+
+
+def reciprocal_rank_fusion(*rankings, k: int, rrf_k: int = RRF_K):
+    """Merge ranked document lists, scoring each chunk by sum(1 / (rrf_k + rank))"""
+    scores = {}
+    documents = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = doc.metadata.get("chunk_id") or (doc.metadata.get("page"), doc.metadata.get("start_index"), doc.page_content)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+            documents.setdefault(key, doc)
+    best = sorted(scores, key=lambda key: scores[key], reverse=True)[:k]
+    return [documents[key] for key in best]
+
+
+def search_document(document_id: str, query: str, k: int = 2):
+    """
+    Hybrid search restricted to one document: vector similarity and BM25
+    keyword hits, merged with reciprocal rank fusion.
+    """
+    document = catalog.get_document(document_id)
+    if document is None:
+        raise ValueError(f"Unknown document: {document_id}")
+
+    if not document["vector_ids"]:
+        # Catalogued from the legacy registry, chunks live in the shared collection
+        with timed("vector_search"):
+            return get_legacy_store().similarity_search(query, k=k, filter={"source": document["path"]})
+
+    candidates = max(k * 2, HYBRID_CANDIDATES)
+    with timed("lexical_search"):
+        keyword_hits = [doc for doc, _ in lexical.search(document_id, query, k=candidates)]
+    with timed("vector_search"):
+        vector_hits = get_vector_store(document_id).similarity_search(query, k=candidates)
+    return reciprocal_rank_fusion(vector_hits, keyword_hits, k=k)
+
+
+@dataclass
+class RetrievalContext:
+    """Per-request agent context: the document the question is about"""
+
+    document_id: str
 
-# print(file_path)
 
 @tool(response_format="content_and_artifact")
-def retrieve_context(query: str):
+def retrieve_context(query: str, runtime: ToolRuntime[RetrievalContext]):
     """Retrieve information to help answer a query."""
-    retrieved_docs = vector_store.similarity_search(query, k=2, filter={"source": file_path})
+    retrieved_docs = search_document(runtime.context.document_id, query, k=2)
     serialized = "\n\n".join(
         (f"Source: {doc.metadata}\nContent: {doc.page_content}")
         for doc in retrieved_docs
@@ -0,0 +1,249 @@
+"""
+Offline re-index of the per-document vector partitions into another storage
+layout: fewer dimensions and/or int8 scalar-quantized vectors.
+
+Reads the vectors already stored in chroma_langchain_db (no embedding API
+calls), truncates and re-normalizes them, writes the new partitions next to
+the existing ones and reports recall@k of the new layout against exact
+search over the full-precision vectors:
+
+    python reindex.py --dimensions 768 --mode int8 --k 10
+    python reindex.py --dimensions 256 --dry-run --json recall.json
+
+The portfolio collection is rebuilt at the new width too, unless the target
+layout goes without it (--no-portfolio; the default for int8). Its float
+copy is counted in the memory report. Then start the API with
+EMBEDDING_DIMENSIONS / VECTOR_STORE_MODE / PORTFOLIO_INDEX set to match.
+Documents still in the legacy shared collection are skipped.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import chromadb
+import numpy as np
+from chromadb.errors import NotFoundError
+
+import catalog
+import rag
+from quantized_store import Int8VectorStore, truncate
+
+
+def ingested_documents(ids: List[str]) -> List[dict]:
+    if ids:
+        return [doc for doc in map(catalog.get_document, ids) if doc is not None]
+    documents, offset = [], 0
+    while True:
+        page = catalog.list_documents(limit=100, offset=offset)
+        if not page:
+            return [doc for doc in documents if doc["status"] == "ingested" and doc["vector_ids"]]
+        documents.extend(page)
+        offset += len(page)
+
+
+def exact_neighbours(vectors: np.ndarray, query: int, k: int) -> List[int]:
+    """Positions of the k nearest chunks to chunk `query` (itself excluded), by inner product"""
+    scores = vectors @ vectors[query]
+    scores[query] = -np.inf
+    return list(np.argsort(-scores)[:k])
+
+
+class Target:
+    """The partition being built in the new layout, with its search path as the API uses it"""
+
+    def __init__(self, client, name: str, mode: str, int8_dir: Path):
+        self.name = name
+        self.mode = mode
+        if mode == "int8":
+            path = int8_dir / f"{name}.npz"
+            path.unlink(missing_ok=True)
+            self.store = Int8VectorStore(path)
+        else:
+            try:
+                client.delete_collection(name)
+            except NotFoundError:
+                pass
+            self.client = client
+            self.collection = client.create_collection(name)
+
+    def add(self, ids, vectors, documents, metadatas):
+        if self.mode == "int8":
+            self.store.add_vectors(ids, vectors, documents, metadatas)
+            return
+        batch = self.client.get_max_batch_size()
+        for start in range(0, len(ids), batch):
+            end = start + batch
+            self.collection.add(ids=ids[start:end], embeddings=vectors[start:end],
+                                documents=documents[start:end], metadatas=metadatas[start:end])
+
+    def search(self, vector, n: int, ids: List[str]) -> List[str]:
+        if self.mode == "int8":
+            return [ids[i] for i, _ in self.store.search_by_vector(vector, n)]
+        return self.collection.query(query_embeddings=[vector], n_results=n, include=[])["ids"][0]
+
+    def nbytes(self, count: int, dimensions: int) -> int:
+        return self.store.nbytes if self.mode == "int8" else count * dimensions * 4
+
+
+def reindex_document(document: dict, args, client, target_client, int8_dir: Path) -> dict:
+    source_name = rag.collection_name(document["id"], dimensions=args.source_dimensions, mode="float")
+    source = client.get_collection(source_name)
+    data = source.get(include=["embeddings", "documents", "metadatas"])
+    ids = data["ids"]
+    full = np.asarray(data["embeddings"], dtype=np.float32)
+    if args.dimensions and args.dimensions > full.shape[1]:
+        raise ValueError(f"{source_name} holds {full.shape[1]}-dimensional vectors, cannot widen to {args.dimensions}")
+    full = truncate(full, 0)
+    reduced = truncate(full, args.dimensions)
+
+    target = Target(target_client, rag.collection_name(document["id"], args.dimensions, args.mode), args.mode, int8_dir)
+    target.add(ids, reduced.tolist(), data["documents"], data["metadatas"])
+
+    # The portfolio is a float copy of the vectors: part of the memory of both layouts
+    source_portfolio = rag.get_existing_collection(rag.portfolio_collection_name(args.source_dimensions))
+    in_portfolio = source_portfolio is not None and bool(ids) and bool(
+        source_portfolio.get(ids=[rag.portfolio_id(document["id"], ids[0])], include=[])["ids"]
+    )
+    if args.dimensions != args.source_dimensions and args.portfolio and not args.dry_run:
+        # The portfolio collection follows the vector width
+        portfolio = target_client.get_or_create_collection(rag.portfolio_collection_name(args.dimensions))
+        batch = target_client.get_max_batch_size()
+        for start in range(0, len(ids), batch):
+            end = start + batch
+            portfolio.upsert(ids=[rag.portfolio_id(document["id"], chunk_id) for chunk_id in ids[start:end]],
+                             embeddings=reduced[start:end].tolist(), documents=data["documents"][start:end],
+                             metadatas=data["metadatas"][start:end])
+
+    # Every sampled chunk is a query; the truth is its exact top-k over the full vectors
+    k = min(args.k, len(ids) - 1)
+    sample = random.Random(args.seed).sample(range(len(ids)), min(args.queries, len(ids))) if k > 0 else []
+    hits = source_hits = 0
+    source_seconds = target_seconds = 0.0
+    for query in sample:
+        truth = {ids[i] for i in exact_neighbours(full, query, k)}
+        start = time.perf_counter()
+        found = source.query(query_embeddings=[full[query].tolist()], n_results=k + 1, include=[])["ids"][0]
+        source_seconds += time.perf_counter() - start
+        source_hits += len(truth & set([i for i in found if i != ids[query]][:k]))
+        start = time.perf_counter()
+        found = target.search(reduced[query].tolist(), k + 1, ids)
+        target_seconds += time.perf_counter() - start
+        hits += len(truth & set([i for i in found if i != ids[query]][:k]))
+
+    queries = len(sample)
+    return {
+        "document_id": document["id"],
+        "name": document["name"],
+        "partition": target.name,
+        "chunks": len(ids),
+        "queries": queries,
+        "k": k,
+        "recall": hits / (queries * k) if queries else None,
+        "source_recall": source_hits / (queries * k) if queries else None,
+        "source_bytes": full.nbytes,
+        "target_bytes": target.nbytes(len(ids), reduced.shape[1]),
+        "source_portfolio_bytes": full.nbytes if in_portfolio else 0,
+        "target_portfolio_bytes": reduced.nbytes if args.portfolio else 0,
+        "source_query_ms": source_seconds / queries * 1000 if queries else None,
+        "target_query_ms": target_seconds / queries * 1000 if queries else None,
+        "_hits": hits,
+        "_source_hits": source_hits,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-index document partitions into a reduced and/or quantized layout")
+    parser.add_argument("--dimensions", type=int, default=rag.EMBEDDING_DIMENSIONS,
+                        help="target vector width, 0 keeps the source width (default: $EMBEDDING_DIMENSIONS)")
+    parser.add_argument("--mode", choices=["float", "int8"], default=rag.VECTOR_STORE_MODE,
+                        help="target storage (default: $VECTOR_STORE_MODE)")
+    parser.add_argument("--source-dimensions", type=int, default=0,
+                        help="width of the float partitions to read, 0 for the original full-width ones")
+    parser.add_argument("--documents", default="", help="comma separated document ids (default: every ingested document)")
+    parser.add_argument("--k", type=int, default=10, help="neighbours compared for recall@k")
+    parser.add_argument("--queries", type=int, default=50, help="chunks sampled as queries per document")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--portfolio", action=argparse.BooleanOptionalAction, default=None,
+                        help="keep the portfolio collection in the target layout "
+                             "(default: $PORTFOLIO_INDEX, else only for float partitions)")
+    parser.add_argument("--dry-run", action="store_true", help="measure recall only, write nothing to chroma_langchain_db")
+    parser.add_argument("--drop-source", action="store_true", help="delete the source partitions once migrated")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    if args.mode == "float" and args.dimensions == args.source_dimensions:
+        parser.error("the target layout is the source layout")
+    if args.dry_run and args.drop_source:
+        parser.error("--drop-source cannot be combined with --dry-run")
+    if args.portfolio is None:
+        args.portfolio = rag.PORTFOLIO_INDEX if "PORTFOLIO_INDEX" in os.environ else args.mode != "int8"
+
+    client = rag.get_chroma_client()
+    scratch = Path(tempfile.mkdtemp(prefix="reindex-")) if args.dry_run else None
+    target_client = chromadb.EphemeralClient() if args.dry_run else client
+    int8_dir = scratch if args.dry_run else rag.int8_store_path("").parent
+
+    if not args.dry_run:
+        # Deleting a document looks for its partitions at every recorded width
+        rag.record_dimensions(args.dimensions)
+
+    documents = ingested_documents([d for d in args.documents.split(",") if d])
+    print(f"Re-indexing {len(documents)} documents into {args.dimensions or 'full'}-dimension {args.mode} partitions"
+          f"{' (dry run)' if args.dry_run else ''}", file=sys.stderr)
+
+    reports, failures = [], 0
+    for document in documents:
+        try:
+            report = reindex_document(document, args, client, target_client, int8_dir)
+        except Exception as e:
+            failures += 1
+            print(f"  {document['id']} ({document['name']}) failed: {e}", file=sys.stderr)
+            continue
+        reports.append(report)
+        recall = f"{report['recall']:.3f}" if report["recall"] is not None else "n/a"
+        print(f"  {report['partition']:<48} chunks={report['chunks']:<6} recall@{report['k']}={recall}", file=sys.stderr)
+        if args.drop_source:
+            client.delete_collection(rag.collection_name(document["id"], dimensions=args.source_dimensions, mode="float"))
+
+    source_portfolio = rag.portfolio_collection_name(args.source_dimensions)
+    # Unless the target layout keeps using it as is
+    if args.drop_source and not failures and (args.dimensions != args.source_dimensions or not args.portfolio):
+        try:
+            client.delete_collection(source_portfolio)
+        except NotFoundError:
+            pass
+
+    queries = sum(r["queries"] * r["k"] for r in reports)
+    summary = {
+        "dimensions": args.dimensions,
+        "mode": args.mode,
+        "documents": len(reports),
+        "failed": failures,
+        "chunks": sum(r["chunks"] for r in reports),
+        "k": args.k,
+        "recall": sum(r["_hits"] for r in reports) / queries if queries else None,
+        "source_recall": sum(r["_source_hits"] for r in reports) / queries if queries else None,
+        "source_bytes": sum(r["source_bytes"] for r in reports),
+        "target_bytes": sum(r["target_bytes"] for r in reports),
+        "source_portfolio_bytes": sum(r["source_portfolio_bytes"] for r in reports),
+        "target_portfolio_bytes": sum(r["target_portfolio_bytes"] for r in reports),
+    }
+    print(f"recall@{args.k}: {summary['recall'] or 0:.3f} (source index: {summary['source_recall'] or 0:.3f}), "
+          f"vectors: {summary['source_bytes'] / 2**20:.1f} MiB -> {summary['target_bytes'] / 2**20:.1f} MiB, "
+          f"with the portfolio copy: {(summary['source_bytes'] + summary['source_portfolio_bytes']) / 2**20:.1f} MiB -> "
+          f"{(summary['target_bytes'] + summary['target_portfolio_bytes']) / 2**20:.1f} MiB")
+    if args.json:
+        for report in reports:
+            del report["_hits"], report["_source_hits"]
+        Path(args.json).write_text(json.dumps({"summary": summary, "documents": reports}, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+import os
+import json
+import asyncio
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from concurrent.futures import Executor, Future
+from typing import Awaitable, Callable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from metrics import cache_lookup
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+RESULT_CACHE_PATH = os.environ.get("RESULT_CACHE_PATH", "docs/result_cache.sqlite")
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "10000"))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key         TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    value       TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_accessed_at ON results (accessed_at);
+"""
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+
+# Results currently being computed, so concurrent requests share one LLM call
+_inflight: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    # Called with _lock held
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(RESULT_CACHE_PATH) or ".", exist_ok=True)
+        _conn = sqlite3.connect(RESULT_CACHE_PATH, timeout=30, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.executescript(SCHEMA)
+    return _conn
+
+
+def make_key(kind: str, content_hash: str, model_name: str, prompts: List[str], schema: Type[BaseModel]) -> str:
+    """
+    Build a cache key from everything that determines an LLM result: the
+    document content, the model, the prompts and the output schema.
+    """
+    prompt_hash = hashlib.sha256("\x00".join(prompts).encode("utf-8")).hexdigest()
+    schema_hash = hashlib.sha256(
+        json.dumps(schema.model_json_schema(), sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return f"{kind}:{content_hash}:{model_name}:{prompt_hash[:16]}:{schema_hash[:16]}"
+
+
+def get(key: str) -> Optional[dict]:
+    """Return the cached result for `key`, or None on a miss"""
+    with _lock:
+        conn = _connect()
+        row = conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key))
+    return json.loads(row[0])
+
+
+def put(key: str, kind: str, value: dict):
+    """Store a result, evicting least recently used entries beyond the size limits"""
+    payload = json.dumps(value)
+    now = time.time()
+    with _lock:
+        conn = _connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, kind, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, payload, len(payload), now, now),
+            )
+            _evict(conn)
+
+
+def _evict(conn: sqlite3.Connection):
+    count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+    if count <= RESULT_CACHE_MAX_ENTRIES and total <= RESULT_CACHE_MAX_BYTES:
+        return
+
+    evicted = 0
+    rows = conn.execute("SELECT key, size FROM results ORDER BY accessed_at ASC").fetchall()
+    for key, size in rows:
+        if count <= RESULT_CACHE_MAX_ENTRIES and total <= RESULT_CACHE_MAX_BYTES:
+            break
+        conn.execute("DELETE FROM results WHERE key = ?", (key,))
+        count -= 1
+        total -= size
+        evicted += 1
+    logger.info(f"Evicted {evicted} entries from the result cache")
+
+
+def _claim(key: str) -> Tuple[Future, bool]:
+    """Return the in-flight future for `key`, and whether the caller now owns it"""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future, False
+        future = Future()
+        _inflight[key] = future
+        return future, True
+
+
+def inflight(key: str) -> Optional[Future]:
+    """The future of a computation of `key` currently running, if any"""
+    with _inflight_lock:
+        return _inflight.get(key)
+
+
+def _compute(key: str, kind: str, compute: Callable[[], dict], future: Future) -> dict:
+    try:
+        value = compute()
+    except BaseException as e:
+        logger.error(f"Computing {kind} result failed: {str(e)}")
+        future.set_exception(e)
+        raise
+    else:
+        try:
+            put(key, kind, value)
+        except Exception as e:
+            logger.error(f"Storing {kind} result failed: {str(e)}")
+        future.set_result(value)
+        return value
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def get_or_compute(key: str, kind: str, compute: Callable[[], dict], refresh: bool = False) -> Tuple[dict, bool]:
+    """
+    Return the cached result for `key`, computing and storing it on a miss.
+
+    If the same result is already being computed (by another request or by a
+    background precompute) this waits for it instead of starting a duplicate.
+
+    Returns:
+        tuple: The result and whether it was served without computing it here
+    """
+    if not refresh:
+        value = get(key)
+        if value is not None:
+            cache_lookup(f"result_{kind}", hit=True)
+            return value, True
+
+    future, owner = _claim(key)
+    # Joining an in-flight computation counts as a hit: no extra LLM call
+    cache_lookup(f"result_{kind}", hit=not owner)
+    if not owner:
+        return future.result(), True
+    return _compute(key, kind, compute, future), False
+
+
+async def aget_or_compute(key: str, kind: str, compute: Callable[[], Awaitable[dict]], refresh: bool = False) -> Tuple[dict, bool]:
+    """
+    Async version of `get_or_compute`.
+
+    The computation runs as its own task, so a client disconnecting does not
+    cancel it for the other requests waiting on the same result. Cache reads
+    and writes run in a thread, off the event loop.
+    """
+    if not refresh:
+        value = await asyncio.to_thread(get, key)
+        if value is not None:
+            cache_lookup(f"result_{kind}", hit=True)
+            return value, True
+
+    future, owner = _claim(key)
+    cache_lookup(f"result_{kind}", hit=not owner)
+    if owner:
+        asyncio.ensure_future(_acompute(key, kind, compute, future))
+    return await asyncio.shield(asyncio.wrap_future(future)), not owner
+
+
+async def _acompute(key: str, kind: str, compute: Callable[[], Awaitable[dict]], future: Future):
+    try:
+        value = await compute()
+    except asyncio.CancelledError as e:
+        future.set_exception(e)
+        raise
+    except Exception as e:
+        # Handed to the waiters rather than raised in a task nobody awaits
+        logger.error(f"Computing {kind} result failed: {str(e)}")
+        future.set_exception(e)
+    else:
+        # The result is good even if it cannot be stored: waiters still get it
+        try:
+            await asyncio.to_thread(put, key, kind, value)
+        except Exception as e:
+            logger.error(f"Storing {kind} result failed: {str(e)}")
+        future.set_result(value)
+    finally:
+        if not future.done():
+            future.set_exception(asyncio.CancelledError())
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def submit(key: str, kind: str, compute: Callable[[], dict], executor: Executor) -> Optional[Future]:
+    """
+    Start computing a result in the background unless it is cached or in flight.
+
+    The key is claimed before this returns, so requests arriving afterwards
+    wait on the background computation rather than starting their own.
+
+    Returns:
+        Future: The computation this call started, or None if the result is
+            cached or already being computed by another caller
+    """
+    if get(key) is not None:
+        return None
+
+    future, owner = _claim(key)
+    if not owner:
+        return None
+    executor.submit(_compute, key, kind, compute, future)
+    return future
@@ -0,0 +1,143 @@
+import re
+import hashlib
+from dataclasses import dataclass
+from typing import List, Pattern
+
+# Configuration
+MAX_EVIDENCE_CHARS = 400  # longest sentence quoted as evidence for a hit
+
+
+@dataclass
+class RiskRule:
+    """A risk category: what it means, how bad it usually is and the wording that signals it"""
+
+    category: str
+    severity: str  # severity hint, one of RiskyClause's levels
+    finding: str
+    patterns: List[str]
+
+    def __post_init__(self):
+        self.regex: Pattern = re.compile("|".join(f"(?:{p})" for p in self.patterns), re.IGNORECASE)
+
+
+RISK_RULES = [
+    RiskRule("unlimited_liability", "Critical", "Liability may be uncapped or expressly unlimited.", [
+        r"\bunlimited liability\b", r"\bliab\w*\b[^.]{0,60}\bwithout (?:any )?limitation\b",
+        r"\bno (?:cap|limit) on (?:its |their )?liability\b",
+        r"\bshall not be (?:subject to|limited by) any (?:cap|limit)",
+    ]),
+    RiskRule("indemnification", "High", "One party must indemnify or hold the other harmless.", [
+        # Not every mention of indemnity: only open-ended ones
+        r"\bindemnif\w*\b[^.]{0,120}\b(?:without limitation|any and all)\b", r"\bunlimited indemnit\w*",
+        r"\bhold(?:s)? harmless\b",
+    ]),
+    RiskRule("unilateral_termination", "High", "A party may terminate at will or without cause.", [
+        r"\bterminat\w*\b[^.]{0,80}\b(?:at any time|for any reason|without cause|for convenience)",
+        r"\btermination for convenience\b",
+    ]),
+    RiskRule("unilateral_amendment", "High", "A party may change the terms on its own.", [
+        r"\b(?:modify|amend|change|update)\b[^.]{0,80}\b(?:sole discretion|at any time|without (?:prior )?(?:notice|consent))",
+        r"\bin its sole discretion\b",
+    ]),
+    RiskRule("auto_renewal", "Medium", "The contract renews automatically unless notice is given in time.", [
+        r"\bautomatic(?:ally)? renew", r"\bauto[- ]?renew", r"\bevergreen\b", r"\bsuccessive (?:renewal )?(?:terms?|periods?)\b",
+    ]),
+    RiskRule("damages_exclusion", "Medium", "Recoverable damages are broadly excluded.", [
+        r"\bin no event shall\b[^.]{0,80}\bliable", r"\b(?:indirect|consequential) damages\b",
+        r"\bdisclaims? (?:all|any) (?:warranties|liability)",
+    ]),
+    RiskRule("waiver_of_rights", "Medium", "A party waives a legal right such as a jury trial or class action.", [
+        r"\bwaives?\b[^.]{0,40}\b(?:jury|class action|right to)\b",
+    ]),
+    RiskRule("exclusivity", "Medium", "Exclusivity, non-compete or non-solicitation restrictions.", [
+        # "exclusive of taxes" or "exclusive jurisdiction" restrict nobody
+        r"\bnon-?compet\w*", r"\bnon-?solicit\w*", r"\bsole and exclusive remedy\b",
+        r"\bexclusive (?:right|licen[cs]e|supplier|provider|distributor|dealer|dealing|arrangement)s?\b",
+        r"\bon an exclusive basis\b", r"\bexclusivity (?:period|obligation|clause|arrangement)s?\b",
+    ]),
+    RiskRule("penalties", "Medium", "Liquidated damages or penalties apply.", [
+        r"\bliquidated damages\b", r"\bpenalt(?:y|ies) (?:of|equal to|amounting to|in the amount of)\b",
+        r"\b(?:pay|incur|be subject to|be liable for) (?:a |any )?penalt(?:y|ies)\b",
+    ]),
+    RiskRule("ip_transfer", "Medium", "Intellectual property is assigned or transferred.", [
+        r"\b(?:assigns?|transfers?)\b[^.]{0,60}\b(?:right, title and interest|intellectual property)",
+    ]),
+    RiskRule("payment_terms", "Low", "Late payment interest, fees or non-refundable amounts.", [
+        r"\blate (?:payment|fee)s?\b", r"\binterest at\b[^.]{0,30}%", r"\bnon-?refundable\b",
+    ]),
+    RiskRule("assignment_restriction", "Low", "Assignment requires the other party's consent.", [
+        r"\b(?:may|shall) not assign\b", r"\bassign\w*\b[^.]{0,60}\bwithout\b[^.]{0,30}\bconsent",
+    ]),
+]
+
+# Part of the audit cache keys: results computed with other rules are not reused
+RULES_VERSION = hashlib.sha256(
+    "\x00".join(f"{rule.category}:{rule.severity}:{'|'.join(rule.patterns)}" for rule in RISK_RULES).encode("utf-8")
+).hexdigest()[:16]
+
+
+SENTENCE_END = re.compile(r"[.;!?](?=\s)|\n\s*\n")
+
+
+def _sentence(text: str, start: int, end: int) -> str:
+    """The sentence around text[start:end], whitespace collapsed and capped in length"""
+    left = 0
+    for boundary in SENTENCE_END.finditer(text, 0, start):
+        left = boundary.end()
+    boundary = SENTENCE_END.search(text, end)
+    right = boundary.end() if boundary else len(text)
+    sentence = " ".join(text[left:right].split())
+    return sentence if len(sentence) <= MAX_EVIDENCE_CHARS else sentence[:MAX_EVIDENCE_CHARS].rsplit(" ", 1)[0] + "..."
+
+
+def scan(chunks: List[dict]) -> List[dict]:
+    """
+    Match every risk rule against a document's chunks (in document order).
+
+    Returns:
+        list: One hit per (category, sentence), in document order, with the
+            index of the chunk it was found in, the page and a severity hint
+    """
+    hits = []
+    seen = set()
+    for index, chunk in enumerate(chunks):
+        text = chunk["page_content"]
+        for rule in RISK_RULES:
+            for match in rule.regex.finditer(text):
+                evidence = _sentence(text, match.start(), match.end())
+                # Overlapping chunks repeat the same sentence
+                if (rule.category, evidence) in seen:
+                    continue
+                seen.add((rule.category, evidence))
+                hits.append({
+                    "chunk": index,
+                    "page": chunk["metadata"].get("page"),
+                    "category": rule.category,
+                    "severity": rule.severity,
+                    "finding": rule.finding,
+                    "evidence": evidence,
+                })
+    return hits
+
+
+def candidate_indices(hits: List[dict], total: int, neighbours: int = 1) -> List[int]:
+    """Indices of the chunks with a hit, plus `neighbours` chunks on each side for context"""
+    selected = set()
+    for hit in hits:
+        selected.update(range(max(0, hit["chunk"] - neighbours), min(total, hit["chunk"] + neighbours + 1)))
+    return sorted(selected)
+
+
+def preliminary_findings(hits: List[dict]) -> List[dict]:
+    """Scanner hits shaped like RiskyClause, tagged with their category and page"""
+    return [
+        {
+            "finding": hit["finding"],
+            "severity": hit["severity"],
+            "evidence": hit["evidence"],
+            "category": hit["category"],
+            "page": hit["page"] + 1 if hit["page"] is not None else None,
+            "source": "scanner",
+        }
+        for hit in hits
+    ]
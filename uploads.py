@@ -0,0 +1,200 @@
+import os
+import hashlib
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+MAX_FIELD_SIZE = 64 * 1024  # largest accepted non-file form field
+MULTIPART_OVERHEAD = 64 * 1024  # allowance for boundaries, headers and form fields in Content-Length checks
+PDF_MAGIC = b"%PDF"
+
+
+@dataclass
+class ReceivedUpload:
+    """A file part of a multipart request, already written to a temp file next to its destination"""
+
+    field: str
+    filename: str
+    content_type: str
+    tmp_path: Optional[str] = None
+    size: int = 0
+    sha256: str = ""
+    error: Optional[str] = None
+    _digest: object = field(default_factory=hashlib.sha256, repr=False)
+    _file: object = field(default=None, repr=False)
+    _head: bytes = field(default=b"", repr=False)
+
+    def discard(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.tmp_path and os.path.exists(self.tmp_path):
+            os.unlink(self.tmp_path)
+        self.tmp_path = None
+
+
+class _Part:
+    def __init__(self):
+        self.headers: Dict[bytes, bytes] = {}
+        self.header_field = b""
+        self.header_value = b""
+        self.upload: Optional[ReceivedUpload] = None
+        self.name = ""
+        self.value = bytearray()
+
+
+async def receive_multipart(request: Request, upload_dir: Path, max_file_size: int,
+                            stop_on_error: bool = True) -> Tuple[Dict[str, List[str]], List[ReceivedUpload]]:
+    """
+    Parse a multipart/form-data request as it arrives, writing each PDF part
+    straight to a temp file in `upload_dir`.
+
+    The PDF signature and size of every file are checked on the bytes
+    received so far, so an oversized or non-PDF upload is rejected without
+    reading (or storing) the rest of it.
+
+    Args:
+        request: The incoming request, its body not read yet
+        upload_dir: Where temp files are created, so the final rename is atomic
+        max_file_size: Largest accepted file, in bytes
+        stop_on_error: Raise (HTTP 400) on the first invalid file. Otherwise
+            the file is skipped and returned with its `error` set.
+
+    Returns:
+        tuple: The form fields ({name: [values]}) and the file parts, in order
+
+    Raises:
+        HTTPException: If the request is not valid multipart data, or with
+            `stop_on_error` if a file is not a valid PDF within the size limit
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload.")
+
+    fields: Dict[str, List[str]] = {}
+    uploads: List[ReceivedUpload] = []
+    events: list = []
+    current: List[_Part] = []
+
+    # The parser calls back synchronously: record what happened and do the
+    # (blocking) file writes after each chunk, in the threadpool
+    def on_part_begin():
+        current.append(_Part())
+        events.append(("begin", current[-1]))
+
+    def on_header_field(data: bytes, start: int, end: int):
+        current[-1].header_field += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        current[-1].header_value += data[start:end]
+
+    def on_header_end():
+        part = current[-1]
+        part.headers[part.header_field.lower()] = part.header_value
+        part.header_field = part.header_value = b""
+
+    def on_headers_finished():
+        events.append(("headers", current[-1]))
+
+    def on_part_data(data: bytes, start: int, end: int):
+        events.append(("data", current[-1], bytes(data[start:end])))
+
+    def on_part_end():
+        events.append(("end", current[-1]))
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    def fail(upload: ReceivedUpload, detail: str):
+        upload.error = detail
+        upload.discard()
+        if stop_on_error:
+            raise HTTPException(status_code=400, detail=detail)
+
+    async def handle(event):
+        kind, part = event[0], event[1]
+        if kind == "headers":
+            _, disposition = parse_options_header(part.headers.get(b"content-disposition", b""))
+            part.name = disposition.get(b"name", b"").decode("utf-8", "replace")
+            if b"filename" not in disposition:
+                return
+            upload = ReceivedUpload(
+                field=part.name,
+                filename=disposition[b"filename"].decode("utf-8", "replace"),
+                content_type=part.headers.get(b"content-type", b"").decode("latin-1"),
+            )
+            part.upload = upload
+            uploads.append(upload)
+            if upload.content_type != "application/pdf":
+                fail(upload, "Only PDF files are allowed. Please upload a valid PDF file.")
+                return
+            upload._file = tempfile.NamedTemporaryFile(dir=upload_dir, prefix=".upload-", suffix=".part", delete=False)
+            upload.tmp_path = upload._file.name
+        elif kind == "data":
+            data = event[2]
+            upload = part.upload
+            if upload is None:
+                part.value += data
+                if len(part.value) > MAX_FIELD_SIZE:
+                    raise HTTPException(status_code=400, detail=f"Form field '{part.name}' is too large.")
+                return
+            if upload.error:
+                return
+            # Validate PDF structure (basic check), even if the signature is split across chunks
+            if len(upload._head) < len(PDF_MAGIC):
+                upload._head += data[:len(PDF_MAGIC) - len(upload._head)]
+                if not PDF_MAGIC.startswith(upload._head[:len(PDF_MAGIC)]):
+                    fail(upload, "Invalid PDF file. File does not appear to be a valid PDF.")
+                    return
+            upload.size += len(data)
+            if upload.size > max_file_size:
+                fail(upload, f"File size exceeds maximum allowed size of {max_file_size / (1024*1024):.1f}MB")
+                return
+            upload._digest.update(data)
+            await run_in_threadpool(upload._file.write, data)
+        elif kind == "end":
+            upload = part.upload
+            if upload is None:
+                fields.setdefault(part.name, []).append(part.value.decode("utf-8", "replace"))
+                return
+            if upload.error:
+                return
+            await run_in_threadpool(upload._file.close)
+            upload._file = None
+            if upload.size == 0:
+                fail(upload, "Uploaded file is empty.")
+            elif len(upload._head) < len(PDF_MAGIC):
+                fail(upload, "Invalid PDF file. File does not appear to be a valid PDF.")
+            else:
+                upload.sha256 = upload._digest.hexdigest()
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for event in events:
+                await handle(event)
+            events.clear()
+        parser.finalize()
+        for event in events:
+            await handle(event)
+    except BaseException as e:
+        # Oversized, invalid or interrupted: nothing of this request is kept
+        for upload in uploads:
+            upload.discard()
+        if isinstance(e, MultipartParseError):
+            raise HTTPException(status_code=400, detail=f"Invalid multipart upload: {str(e)}")
+        raise
+    return fields, uploads